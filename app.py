@@ -1,9 +1,20 @@
 from flask import Flask
 from dotenv import load_dotenv
-from sqlalchemy import inspect, text
 import os
 
+import anomalies
+import assets
+import backup
+import compression
+import export_formats
+import fragments
+import group_commit
+import maintenance
+import outbox
+import profiling
+import sites
 from extensions import db
+from migrations import upgrade_all
 
 
 def create_app():
@@ -14,7 +25,18 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')  # must be set!
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'change-this-secret')
 
+    sites.init_app(app)
     db.init_app(app)
+    fragments.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
+    group_commit.init_app(app)
+    profiling.init_app(app)
+    outbox.init_app(app)
+    export_formats.init_app(app)
+    backup.init_app(app)
+    maintenance.init_app(app)
+    anomalies.init_app(app)
 
     # Import and register routes
     from routes import main_bp
@@ -23,22 +45,12 @@ def create_app():
     return app
 
 
-def _ensure_schema():
-    inspector = inspect(db.engine)
-    if "employee" not in inspector.get_table_names():
-        return
-
-    columns = {column["name"] for column in inspector.get_columns("employee")}
-    if "is_manager" not in columns:
-        db.session.execute(
-            text("ALTER TABLE employee ADD COLUMN is_manager BOOLEAN NOT NULL DEFAULT 0")
-        )
-        db.session.commit()
-
-
 if __name__ == "__main__":
     app = create_app()
     with app.app_context():
-        db.create_all()  # creates tables if they don't exist
-        _ensure_schema()
+        upgrade_all()  # creates or migrates every site; a current schema costs one read each
+    # The reloader's child serves requests; its parent only watches files.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        outbox.start_worker(app)
+        maintenance.start_scheduler(app)
     app.run(debug=True)
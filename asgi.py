@@ -0,0 +1,380 @@
+"""ASGI entry point with async handlers for the kiosk and report endpoints.
+
+The clock page, the clock status JSON and ``/admin/report`` run as coroutines
+on async SQLAlchemy, so they never wait for a worker thread. Every other route
+is the regular Flask app behind a2wsgi's WSGI bridge, run on a bounded thread
+pool, so slow exports can use up that pool without holding up clock-ins.
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import os
+import queue
+import tempfile
+from datetime import datetime
+
+from flask import Response, redirect, render_template, request, session, url_for, jsonify
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+
+import group_commit
+import maintenance
+import outbox
+from app import create_app
+from live import KEEPALIVE_SECONDS, format_sse, hub, start_feed
+from migrations import upgrade_all
+from models import Employee, apply_clock_action
+from profiling import SKIP_PROFILE_ENVIRON_KEY
+from routes import (
+    TEST_EMPLOYEE_CODE, _active_record_statement, _admin_guard, _admin_report_range, _admin_report_statement,
+    _clock_period_range, _clock_status_response, _closed_shifts_statement,
+    _finish_admin_report, _live_board_snapshot, _merge_site_reports, _period_records_statement,
+    _render_clock, _reports_all_sites, _serialize_admin_report, _sum_shift_hours,
+    ensure_test_employee
+)
+from sites import current_site, select_kiosk_site, site_engines, site_names
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite"}
+REQUEST_BODY_MEMORY_LIMIT = 1024 * 1024
+LIVE_POLL_SECONDS = 0.25
+
+
+class AsyncSiteDatabases:
+    """One async engine per site, built from the Flask-SQLAlchemy engine's URL."""
+
+    def __init__(self):
+        self._engines = {}
+
+    def _engine(self, site):
+        engine = self._engines.get(site)
+        if engine is None:
+            url = make_url(site_engines()[site].url)
+            driver = ASYNC_DRIVERS.get(url.get_backend_name())
+            if not driver:
+                raise RuntimeError(f"No async driver configured for {url.get_backend_name()!r}")
+            engine = create_async_engine(url.set(drivername=driver))
+            self._engines[site] = engine
+        return engine
+
+    def session(self, site=None):
+        # Objects stay usable after commit; lazy refreshes can't run outside a greenlet.
+        return AsyncSession(self._engine(site or current_site()), expire_on_commit=False)
+
+    async def dispose(self):
+        for engine in self._engines.values():
+            await engine.dispose()
+        self._engines.clear()
+
+
+databases = AsyncSiteDatabases()
+
+
+class AsyncStream:
+    """Return value for async views that stream; chunks come from an async iterator."""
+
+    def __init__(self, chunks, mimetype, headers=None):
+        self.chunks = chunks
+        self.mimetype = mimetype
+        self.headers = headers or {}
+
+
+async def _get_active_record(db_session, employee_id):
+    return (await db_session.scalars(_active_record_statement(employee_id))).first()
+
+
+async def clock():
+    employee_id = session.get("employee_id")
+    if not employee_id:
+        return redirect(url_for("main.login"))
+
+    async with databases.session() as db_session:
+        employee = await db_session.get(Employee, employee_id)
+        if not employee:
+            session.pop("employee_id", None)
+            return redirect(url_for("main.login"))
+
+        now = datetime.now()
+        _, _, period_start_dt, period_end_dt = _clock_period_range(now.date())
+        active_record = await _get_active_record(db_session, employee.id)
+
+        error = None
+        if request.method == "POST":
+            action = request.form.get("action")
+            if group_commit.is_enabled() and action in ("in", "out"):
+                # Ends the read transaction so the connection goes back to the pool
+                # while waiting; unlike rollback it leaves loaded objects usable.
+                await db_session.commit()
+                error, _result = await group_commit.submit_clock_event_async(employee_id, action, now)
+            else:
+                error, record = apply_clock_action(action, employee.id, active_record, now)
+                if not error:
+                    db_session.add(record)
+                    await db_session.commit()
+            if not error:
+                return redirect(url_for("main.clock"))
+
+        records = (await db_session.scalars(
+            _period_records_statement(employee.id, period_start_dt, period_end_dt)
+        )).all()
+    return _render_clock(employee, records, active_record, now, error)
+
+
+async def clock_status():
+    employee_id = session.get("employee_id")
+    if not employee_id:
+        return jsonify({"error": "Employee login required."}), 401
+
+    pay_period_start, pay_period_end, period_start_dt, period_end_dt = _clock_period_range(
+        datetime.now().date()
+    )
+    async with databases.session() as db_session:
+        active_record = await _get_active_record(db_session, employee_id)
+        closed_shifts = await db_session.execute(
+            _closed_shifts_statement(employee_id, period_start_dt, period_end_dt)
+        )
+        period_total_hours = _sum_shift_hours(closed_shifts)
+    return _clock_status_response(active_record, period_total_hours, pay_period_start, pay_period_end)
+
+
+async def _build_admin_report(form, site=None):
+    report, range_start, range_end = _admin_report_range(form)
+    async with databases.session(site) as db_session:
+        employee_id = form.get("employee_id")
+        if employee_id and employee_id != "all":
+            report["selected_employee"] = await db_session.get(Employee, employee_id)
+
+        if range_start and range_end:
+            records = (await db_session.scalars(
+                _admin_report_statement(range_start, range_end, report["selected_employee"])
+            )).all()
+            _finish_admin_report(report, records)
+    return report
+
+
+async def admin_report():
+    guard = _admin_guard({"error": "Admin login required.", "show_results": False})
+    if guard:
+        return guard
+
+    if not _reports_all_sites(request.form):
+        report = await _build_admin_report(request.form)
+    else:
+        sites = site_names()
+        reports = await asyncio.gather(*(_build_admin_report(request.form, site) for site in sites))
+        report = _merge_site_reports(dict(zip(sites, reports)))
+    return jsonify(_serialize_admin_report(report))
+
+
+async def login():
+    site = (request.form.get("site") or current_site()).strip()
+    if site not in site_names():
+        return render_template("login.html", error="Select a valid location.")
+    select_kiosk_site(site)
+
+    code = (request.form.get("employee_code") or "").strip()
+    async with databases.session() as db_session:
+        employee_id = (await db_session.scalars(
+            select(Employee.id).filter_by(employee_code=code).limit(1)
+        )).first()
+
+    if code == TEST_EMPLOYEE_CODE and not employee_id:
+        employee_id = await asyncio.to_thread(lambda: ensure_test_employee().id)
+
+    if employee_id:
+        session["employee_id"] = employee_id
+        return redirect(url_for("main.clock"))
+    return render_template("login.html", error="Invalid employee code.")
+
+
+async def _live_events(subscriber, snapshot):
+    # Polls the hub's thread-safe queue instead of blocking on it, so an idle
+    # board costs a timer on the event loop rather than a thread.
+    try:
+        yield format_sse("snapshot", snapshot)
+        idle_seconds = 0
+        while True:
+            try:
+                event = subscriber.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(LIVE_POLL_SECONDS)
+                idle_seconds += LIVE_POLL_SECONDS
+                if idle_seconds >= KEEPALIVE_SECONDS:
+                    idle_seconds = 0
+                    yield ": keepalive\n\n"
+                continue
+            idle_seconds = 0
+            if event.get("type") == "close":
+                return
+            if event.get("type") == "resync":
+                yield format_sse("snapshot", await asyncio.to_thread(_live_board_snapshot))
+            else:
+                yield format_sse("shift", event)
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+async def admin_live_stream():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    # Start the feed and subscribe before the snapshot so nothing committed in
+    # between is missed.
+    await asyncio.to_thread(start_feed)
+    subscriber = hub.subscribe()
+    snapshot = await asyncio.to_thread(_live_board_snapshot)
+    return AsyncStream(
+        _live_events(subscriber, snapshot),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+ASYNC_VIEWS = {
+    ("POST", "/clock/login"): login,
+    ("GET", "/clock"): clock,
+    ("POST", "/clock"): clock,
+    ("GET", "/clock/status"): clock_status,
+    ("POST", "/admin/report"): admin_report,
+    ("GET", "/admin/live/stream"): admin_live_stream,
+}
+
+
+async def _read_body(receive):
+    body = tempfile.SpooledTemporaryFile(max_size=REQUEST_BODY_MEMORY_LIMIT)
+    more_body = True
+    while more_body:
+        message = await receive()
+        body.write(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    body.seek(0)
+    return body
+
+
+def _terminated_input(environ):
+    # The bridge reads the body to its end, so Werkzeug may read a request
+    # without Content-Length (a chunked POST) instead of treating it as empty.
+    environ["wsgi.input_terminated"] = True
+    return environ
+
+
+def _wsgi_app(flask_app):
+    def app(environ, start_response):
+        return flask_app(_terminated_input(environ), start_response)
+    return app
+
+
+def _start_message(status_code, headers):
+    return {
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers],
+    }
+
+
+class ClockInASGI:
+    """Route the hot endpoints to coroutines and everything else to the Flask app."""
+
+    def __init__(self, flask_app, wsgi_threads):
+        self.flask_app = flask_app
+        self._wsgi = WSGIMiddleware(_wsgi_app(flask_app), workers=wsgi_threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        view = ASYNC_VIEWS.get((scope["method"], scope["path"]))
+        if view:
+            environ = _terminated_input(build_environ(scope, await _read_body(receive)))
+            await self._call_async_view(view, environ, receive, send)
+        else:
+            await self._wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await asyncio.to_thread(self._upgrade)
+                outbox.start_worker(self.flask_app)
+                maintenance.start_scheduler(self.flask_app)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await databases.dispose()
+                self._wsgi.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _upgrade(self):
+        with self.flask_app.app_context():
+            upgrade_all()
+
+    async def _call_async_view(self, view, environ, receive, send):
+        app = self.flask_app
+        # cProfile follows one thread, and coroutines interleave on the event loop.
+        environ[SKIP_PROFILE_ENVIRON_KEY] = True
+        with app.request_context(environ):
+            # Same order as Flask's full_dispatch_request: hooks, view, error handlers, after_request.
+            stream = None
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view()
+                    if isinstance(rv, AsyncStream):
+                        stream = rv
+                        rv = Response(mimetype=stream.mimetype, headers=stream.headers)
+                        # Keeps after_request hooks (compression) from buffering the body.
+                        rv.direct_passthrough = True
+                except Exception as error:
+                    rv = app.handle_user_exception(error)
+                response = app.finalize_request(rv)
+            except Exception as error:
+                response = app.handle_exception(error)
+
+            if stream:
+                await send(_start_message(response.status_code, response.headers.to_wsgi_list()))
+                await self._send_stream(stream.chunks, receive, send)
+                return
+            # Werkzeug drops the body and fixes headers for 304s and HEAD here.
+            app_iter, status, headers = response.get_wsgi_response(environ)
+            await send(_start_message(int(status.split(" ", 1)[0]), headers))
+            try:
+                for chunk in app_iter:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            finally:
+                if hasattr(app_iter, "close"):
+                    app_iter.close()
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_stream(self, chunks, receive, send):
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            async for chunk in chunks:
+                if watcher.done():
+                    return
+                await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            watcher.cancel()
+            await chunks.aclose()
+
+
+def create_asgi_app(flask_app=None):
+    return ClockInASGI(
+        flask_app or create_app(),
+        wsgi_threads=int(os.getenv("ASGI_WSGI_THREADS", "32"))
+    )
+
+
+application = create_asgi_app()
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+
+from flask import abort, current_app, send_from_directory, url_for
+
+ASSET_MAX_AGE_SECONDS = 365 * 24 * 60 * 60
+HASH_LENGTH = 12
+
+
+def _fingerprint(filename, digest):
+    root, extension = os.path.splitext(filename)
+    return f"{root}.{digest[:HASH_LENGTH]}{extension}"
+
+
+class AssetManifest:
+    """Map static files to content-hashed names so they can be cached forever."""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._lock = threading.Lock()
+        self._hashed = {}
+        self._originals = {}
+        self._mtimes = {}
+        self.version = ""
+
+    def _scan_mtimes(self):
+        mtimes = {}
+        for directory, _subdirs, files in os.walk(self.static_folder):
+            for name in files:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.static_folder).replace(os.sep, "/")
+                mtimes[relative] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def build(self):
+        mtimes = self._scan_mtimes()
+        hashed = {}
+        for relative in sorted(mtimes):
+            with open(os.path.join(self.static_folder, relative), "rb") as handle:
+                hashed[relative] = _fingerprint(relative, hashlib.sha256(handle.read()).hexdigest())
+        version = hashlib.sha256("\n".join(sorted(hashed.values())).encode()).hexdigest()
+        with self._lock:
+            self._hashed = hashed
+            self._originals = {value: key for key, value in hashed.items()}
+            self._mtimes = mtimes
+            self.version = version[:HASH_LENGTH]
+
+    def refresh_if_changed(self):
+        if self._scan_mtimes() != self._mtimes:
+            self.build()
+
+    def hashed_name(self, filename):
+        return self._hashed.get(filename)
+
+    def original_name(self, hashed_filename):
+        return self._originals.get(hashed_filename)
+
+
+def _manifest():
+    manifest = current_app.extensions["asset_manifest"]
+    if current_app.debug:
+        # Edits during development show up without a restart.
+        manifest.refresh_if_changed()
+    return manifest
+
+
+def asset_url(filename):
+    hashed = _manifest().hashed_name(filename)
+    if not hashed:
+        return url_for("static", filename=filename)
+    return url_for("asset", filename=hashed)
+
+
+def asset_version():
+    return _manifest().version
+
+
+def serve_asset(filename):
+    original = _manifest().original_name(filename)
+    if not original:
+        abort(404)
+    response = send_from_directory(
+        current_app.static_folder, original, max_age=ASSET_MAX_AGE_SECONDS
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    manifest = AssetManifest(app.static_folder)
+    manifest.build()
+    app.extensions["asset_manifest"] = manifest
+    app.add_url_rule("/assets/<path:filename>", "asset", serve_asset)
+    app.add_template_global(asset_url)
+    app.add_template_global(asset_version)
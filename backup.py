@@ -0,0 +1,177 @@
+"""Online backups of each location's SQLite database.
+
+The copy goes through SQLite's backup API BACKUP_STEP_PAGES pages at a time,
+pausing BACKUP_PAUSE_SECONDS between steps. A step only holds a read lock, and
+the pause lets waiting clock-ins commit, so kiosks never wait on more than one
+step. A write from another connection makes SQLite restart the copy; after
+BACKUP_MAX_RESTARTS restarts the rest is copied in one step instead. Each copy
+is written beside its final name, checked with PRAGMA integrity_check, renamed
+into place and the oldest copies beyond BACKUP_KEEP are removed. Each site's
+copies live in their own BACKUP_DIR/<site>/ directory as
+<site>-YYYYmmdd-HHMMSS.db.
+
+Runs nightly as the last maintenance task (see maintenance.py) and on demand:
+
+    python backup.py                         # every site, now
+    python backup.py --site main --dir /mnt/backups
+"""
+import argparse
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from sites import current_site
+
+BACKUP_SUFFIX = ".db"
+BACKUP_TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _main_database_path(connection):
+    for _seq, name, path in connection.execute("PRAGMA database_list"):
+        if name == "main":
+            return path or None
+    return None
+
+
+def copy_database(source, target_path, config):
+    """Copy source into a new database at target_path a step at a time and return copy stats."""
+    step_pages = int(config["BACKUP_STEP_PAGES"])
+    pause = config["BACKUP_PAUSE_SECONDS"]
+    stats = {"steps": 0, "restarts": 0, "pages": 0, "single_step": False}
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats["steps"] += 1
+        stats["pages"] = total
+        if last_remaining is not None and remaining > last_remaining:
+            stats["restarts"] += 1
+            if stats["restarts"] > config["BACKUP_MAX_RESTARTS"]:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+        if remaining:
+            time.sleep(pause)
+
+    started = time.perf_counter()
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            source.backup(target, pages=step_pages, progress=progress)
+        except _TooManyRestarts:
+            # Writes keep landing between steps; copy the rest while holding
+            # the read lock, which makes clock-ins wait for this one step.
+            stats["single_step"] = True
+            source.backup(target)
+        stats["bytes"] = os.path.getsize(target_path)
+    finally:
+        target.close()
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def integrity_problems(path):
+    connection = sqlite3.connect(path)
+    try:
+        results = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+    finally:
+        connection.close()
+    return [result for result in results if result != "ok"]
+
+
+def rotate(backup_dir, name, keep):
+    """Remove all but the newest keep backups of name; return the removed file names.
+
+    Only files named exactly ``<name>-YYYYmmdd-HHMMSS.db`` count, so another
+    site whose name starts with name is never touched.
+    """
+    pattern = re.compile(rf"{re.escape(name)}-\d{{8}}-\d{{6}}{re.escape(BACKUP_SUFFIX)}")
+    backups = sorted(entry for entry in os.listdir(backup_dir) if pattern.fullmatch(entry))
+    removed = backups[:-keep] if keep > 0 else []
+    for entry in removed:
+        os.remove(os.path.join(backup_dir, entry))
+    return removed
+
+
+def backup(connection, config):
+    """Maintenance task: copy the site's database to BACKUP_DIR/<site>, verify the copy and rotate old ones."""
+    if not _main_database_path(connection):
+        return "skipped", 0, "in-memory database"
+    # run_task has already pointed the session at the site being maintained.
+    name = current_site()
+    backup_dir = os.path.join(config["BACKUP_DIR"], name)
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, f"{name}-{datetime.now().strftime(BACKUP_TIMESTAMP_FORMAT)}{BACKUP_SUFFIX}")
+    temp_path = path + ".tmp"
+
+    try:
+        stats = copy_database(connection, temp_path, config)
+        problems = integrity_problems(temp_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if problems:
+        os.remove(temp_path)
+        return "failed", 0, "backup copy failed integrity_check: " + "; ".join(problems[:20])
+    os.replace(temp_path, path)
+    removed = rotate(backup_dir, name, int(config["BACKUP_KEEP"]))
+
+    megabytes = stats["bytes"] / (1024 * 1024)
+    detail = (
+        f"{path}: {megabytes:.1f} MB in {stats['seconds']:.1f} s "
+        f"({megabytes / max(stats['seconds'], 0.001):.1f} MB/s), {stats['steps']} steps, "
+        f"{stats['restarts']} restarts"
+    )
+    if stats["single_step"]:
+        detail += ", finished in one step"
+    if removed:
+        detail += f", removed {len(removed)} old"
+    return "ok", 0, detail
+
+
+def init_app(app):
+    app.config.setdefault(
+        "BACKUP_DIR", os.getenv("BACKUP_DIR") or os.path.join(app.instance_path, "backups")
+    )
+    app.config.setdefault("BACKUP_KEEP", int(os.getenv("BACKUP_KEEP", "14")))
+    app.config.setdefault("BACKUP_STEP_PAGES", int(os.getenv("BACKUP_STEP_PAGES", "1024")))
+    app.config.setdefault("BACKUP_PAUSE_SECONDS", float(os.getenv("BACKUP_PAUSE_SECONDS", "0.01")))
+    app.config.setdefault("BACKUP_MAX_RESTARTS", int(os.getenv("BACKUP_MAX_RESTARTS", "3")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up every site's database now.")
+    parser.add_argument("--site", action="append", help="site to back up (repeatable; default: all)")
+    parser.add_argument("--dir", help="override BACKUP_DIR")
+    parser.add_argument("--keep", type=int, help="override BACKUP_KEEP")
+    args = parser.parse_args()
+
+    from app import create_app
+    from maintenance import run_task
+    from migrations import upgrade_all
+    from sites import site_names
+
+    app = create_app()
+    if args.dir:
+        app.config["BACKUP_DIR"] = args.dir
+    if args.keep is not None:
+        app.config["BACKUP_KEEP"] = args.keep
+    with app.app_context():
+        upgrade_all()
+        failed = False
+        for site in args.site or site_names():
+            run = run_task(site, "backup")
+            print(f"{site:<12} {run.status:<12} {run.detail}")
+            failed = failed or run.status not in ("ok", "skipped")
+        if failed:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
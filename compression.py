@@ -0,0 +1,105 @@
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/javascript",
+    "application/json",
+    "text/css",
+    "text/csv",
+    "text/event-stream",
+    "text/html",
+    "text/plain",
+}
+
+
+def _available_encodings():
+    return ("br", "gzip") if brotli else ("gzip",)
+
+
+def _negotiate_encoding():
+    accepted = request.accept_encodings
+    candidates = [
+        (accepted.quality(encoding), -index, encoding)
+        for index, encoding in enumerate(_available_encodings())
+        if accepted.quality(encoding) > 0
+    ]
+    return max(candidates)[2] if candidates else None
+
+
+def _compressor(encoding, level):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=min(level, 11))
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return (
+        compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def _compress_body(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_stream(chunks, encoding, level):
+    compress, flush, finish = _compressor(encoding, level)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            # Flush every chunk so streamed events reach the client immediately.
+            yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def compress_response(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    if "no-transform" in (response.headers.get("Cache-Control") or ""):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _negotiate_encoding()
+    if not encoding:
+        return response
+
+    level = current_app.config["COMPRESSION_LEVEL"]
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config["COMPRESSION_MIN_SIZE"]:
+            return response
+        response.set_data(_compress_body(data, encoding, level))
+
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The encoded bytes differ from the identity body the ETag described.
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.config.setdefault("COMPRESSION_MIN_SIZE", 500)
+    app.config.setdefault("COMPRESSION_LEVEL", 6)
+    app.after_request(compress_response)
@@ -0,0 +1,184 @@
+"""Payroll export formatters and the on-disk cache of rendered exports.
+
+Every formatter renders the same ledger rows (one dict per employee, built by
+routes._build_hours_export) and yields the file a chunk at a time. To add a
+format, write a render function and add it to EXPORT_FORMATS.
+"""
+import csv
+import io
+import os
+import tempfile
+
+from flask import current_app
+
+from journal import changed_since, latest_seq
+from sites import current_site
+
+
+class ExportFormat:
+    def __init__(self, label, mimetype, extension, render):
+        self.label = label
+        self.mimetype = mimetype
+        self.extension = extension
+        self.render = render
+
+
+def format_export_line(row):
+    """One ``First L, 12.5, Bonus, $100 (Salary)`` line of the text export."""
+    salary_suffix = " (Salary)" if row["is_manager"] else ""
+    bonus_text = f", Bonus, ${row['bonus_amount']:.0f}" if row["bonus_amount"] > 0 else ""
+    return f"{row['display_name']}, {row['rounded_hours']:.1f}{bonus_text}{salary_suffix}"
+
+
+def render_text(rows, start_date, end_date):
+    for row in rows:
+        yield format_export_line(row) + "\n"
+
+
+CSV_COLUMNS = (
+    "employee_code", "first_name", "last_name", "period_start", "period_end",
+    "hours", "bonus", "salaried",
+)
+
+
+def render_csv(rows, start_date, end_date):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            row["employee_code"],
+            row["first_name"],
+            row["last_name"],
+            start_date.isoformat(),
+            end_date.isoformat(),
+            f"{row['rounded_hours']:.2f}",
+            f"{row['bonus_amount']:.2f}",
+            "Y" if row["is_manager"] else "N",
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+# (field, width, alignment); numbers are right-aligned and zero-filled.
+FIXED_WIDTH_LAYOUT = (
+    ("employee_code", 10, "<"),
+    ("last_name", 20, "<"),
+    ("first_name", 15, "<"),
+    ("period_start", 8, "<"),
+    ("period_end", 8, "<"),
+    ("hours", 7, ">"),
+    ("bonus", 9, ">"),
+    ("salaried", 1, "<"),
+)
+
+
+def render_fixed_width(rows, start_date, end_date):
+    for row in rows:
+        values = {
+            "employee_code": row["employee_code"],
+            "first_name": row["first_name"],
+            "last_name": row["last_name"],
+            "period_start": start_date.strftime("%Y%m%d"),
+            "period_end": end_date.strftime("%Y%m%d"),
+            # Hundredths with no decimal point, e.g. 12.5 hours -> 0001250.
+            "hours": str(round(row["rounded_hours"] * 100)),
+            "bonus": str(round(row["bonus_amount"] * 100)),
+            "salaried": "Y" if row["is_manager"] else "N",
+        }
+        fields = []
+        for name, width, alignment in FIXED_WIDTH_LAYOUT:
+            value = values[name][:width]
+            fields.append(value.zfill(width) if alignment == ">" else value.ljust(width))
+        yield "".join(fields) + "\r\n"
+
+
+EXPORT_FORMATS = {
+    "text": ExportFormat("Payroll Lines", "text/plain", "txt", render_text),
+    "csv": ExportFormat("CSV", "text/csv", "csv", render_csv),
+    "fixed": ExportFormat("Fixed Width", "text/plain", "dat", render_fixed_width),
+}
+
+
+def _cache_prefix(format_name, start_date, end_date):
+    return f"{current_site()}-{start_date:%Y%m%d}-{end_date:%Y%m%d}-{format_name}-"
+
+
+def _render_to(path, export_format, rows, start_date, end_date):
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(handle, "w", newline="") as output:
+        for chunk in export_format.render(rows, start_date, end_date):
+            output.write(chunk)
+    rendered = open(temp_path, "rb")
+    # Rename is atomic, so concurrent downloads see a complete file or none.
+    os.replace(temp_path, path)
+    return rendered
+
+
+def cached_export(format_name, start_date, end_date, build_rows):
+    """Return the rendered export as an open binary file, rendering only when its period changed.
+
+    Files are named after the change journal sequence they are current as of.
+    An older file is reused when nothing journaled since then touches the
+    period, so edits to other periods don't invalidate it. build_rows() is only
+    called on a miss. Files live in EXPORT_CACHE_DIR, shared by every worker;
+    returning an open file keeps a download intact if another worker replaces it.
+    """
+    export_format = EXPORT_FORMATS[format_name]
+    cache_dir = current_app.config["EXPORT_CACHE_DIR"]
+    os.makedirs(cache_dir, exist_ok=True)
+    prefix = _cache_prefix(format_name, start_date, end_date)
+    path = os.path.join(cache_dir, f"{prefix}{latest_seq()}.{export_format.extension}")
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        pass
+
+    for name in os.listdir(cache_dir):
+        if not name.startswith(prefix):
+            continue
+        cached_seq = name[len(prefix):].split(".", 1)[0]
+        cached_path = os.path.join(cache_dir, name)
+        try:
+            if cached_seq.isdigit() and not changed_since(int(cached_seq), start_date, end_date):
+                # Relabel so the next check only looks at changes after this sequence.
+                os.replace(cached_path, path)
+                return open(path, "rb")
+            os.remove(cached_path)
+        except FileNotFoundError:
+            continue
+
+    return _render_to(path, export_format, build_rows(), start_date, end_date)
+
+
+def discard_cached_exports(through_seq):
+    """Delete the current site's cached exports built at or before through_seq and return how many.
+
+    A cached file is revalidated against the journal rows after its sequence,
+    so it has to go before those rows are pruned; the next download re-renders it.
+    """
+    cache_dir = current_app.config["EXPORT_CACHE_DIR"]
+    prefix = f"{current_site()}-"
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        cached_seq = name.rsplit("-", 1)[-1].split(".", 1)[0]
+        if not name.startswith(prefix) or not cached_seq.isdigit() or int(cached_seq) > through_seq:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def init_app(app):
+    app.config.setdefault(
+        "EXPORT_CACHE_DIR", os.getenv("EXPORT_CACHE_DIR") or os.path.join(app.instance_path, "export_cache")
+    )
+    app.add_template_global(EXPORT_FORMATS, "export_formats")
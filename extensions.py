@@ -1,3 +1,17 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 
-db = SQLAlchemy()
+
+class SiteSession(Session):
+    """Session that sends every statement to the database of the current site."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            bind_key = g.get("site_bind_key")
+            if bind_key is not None:
+                return self._db.engines[bind_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": SiteSession})
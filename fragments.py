@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+from extensions import db
+from models import CacheVersion
+
+ROSTER_VERSION = "roster"
+
+
+class FragmentCache:
+    """Small thread-safe LRU of rendered template fragments."""
+
+    def __init__(self, max_entries=256):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        html = str(render())
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+def get_version(name):
+    row = db.session.get(CacheVersion, name)
+    return row.version if row else 0
+
+
+def bump_version(name):
+    """Increment a cache version as part of the caller's transaction."""
+    row = db.session.get(CacheVersion, name)
+    if not row:
+        db.session.add(CacheVersion(name=name, version=1))
+    else:
+        # Increment in SQL so concurrent workers can't lose a bump.
+        row.version = CacheVersion.version + 1
+
+
+def roster_version():
+    return get_version(ROSTER_VERSION)
+
+
+def bump_roster_version():
+    bump_version(ROSTER_VERSION)
+
+
+def cached_fragment(*key, caller):
+    """Render the body of a ``{% call %}`` block once per key."""
+    return Markup(fragment_cache.get_or_render(key, caller))
+
+
+def init_app(app):
+    cache_dir = os.getenv("TEMPLATE_CACHE_DIR") or os.path.join(app.instance_path, "jinja_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    # Compiled templates survive worker restarts, so cold workers skip the Jinja compile.
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(cache_dir)}
+    app.add_template_global(cached_fragment)
@@ -0,0 +1,237 @@
+import asyncio
+import functools
+import os
+import queue
+import threading
+import time
+
+from flask import current_app
+
+from extensions import db
+from models import TimeRecord, apply_clock_action
+from sites import current_site, use_site
+
+SUBMIT_TIMEOUT_SECONDS = 10
+SAVE_FAILED_MESSAGE = "Could not save your punch. Please try again."
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+class _ClockEvent:
+    def __init__(self, employee_id, action, at):
+        self.employee_id = employee_id
+        self.action = action
+        self.at = at
+        self.error = None
+        self.result = None
+        self.done = threading.Event()
+        self.on_done = None
+        self._claimed = False
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Take the event into a transaction unless its request has given up on it."""
+        with self._lock:
+            if self._cancelled:
+                return False
+            self._claimed = True
+            return True
+
+    def cancel(self):
+        """Withdraw the event unless a transaction has already taken it."""
+        with self._lock:
+            if self._claimed:
+                return False
+            self._cancelled = True
+            return True
+
+
+def _resolve_threadsafe(loop, future):
+    def resolve():
+        if not future.done():
+            future.set_result(None)
+    try:
+        loop.call_soon_threadsafe(resolve)
+    except RuntimeError:
+        pass  # The event loop has closed; nobody is waiting any more.
+
+
+class GroupCommitWriter:
+    """Background writer that commits clock events from many requests in one transaction.
+
+    Requests block in submit() until the transaction holding their event has
+    committed, so a successful return means the punch is durable. A request
+    that times out withdraws its event if no transaction has taken it yet;
+    otherwise it waits for that transaction, so an error is only returned for
+    a punch that was not saved.
+    """
+
+    def __init__(self, app, site, window_seconds, max_batch_size):
+        self.app = app
+        self.site = site
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name=f"group-commit-{site}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, employee_id, action, at, timeout=SUBMIT_TIMEOUT_SECONDS):
+        event = _ClockEvent(employee_id, action, at)
+        self._queue.put(event)
+        if not event.done.wait(timeout):
+            if event.cancel():
+                return SAVE_FAILED_MESSAGE, None
+            event.done.wait()
+        return event.error, event.result
+
+    async def submit_async(self, employee_id, action, at, timeout=SUBMIT_TIMEOUT_SECONDS):
+        """submit() for coroutines: waits on a future instead of holding a thread."""
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+        event = _ClockEvent(employee_id, action, at)
+        event.on_done = functools.partial(_resolve_threadsafe, loop, finished)
+        self._queue.put(event)
+        try:
+            await asyncio.wait_for(asyncio.shield(finished), timeout)
+        except asyncio.TimeoutError:
+            if event.cancel():
+                return SAVE_FAILED_MESSAGE, None
+            await finished
+        return event.error, event.result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [event for event in self._collect() if event.claim()]
+            if not batch:
+                continue
+            try:
+                if len(batch) == 1:
+                    self._commit_alone(batch[0])
+                elif not self._commit_batch(batch):
+                    # One bad event must not fail the others: retry each alone.
+                    for event in batch:
+                        self._commit_alone(event)
+            finally:
+                for event in batch:
+                    event.done.set()
+                    if event.on_done:
+                        event.on_done()
+
+    def _commit_batch(self, batch):
+        try:
+            self._commit(batch)
+        except Exception:
+            self.app.logger.exception("Group commit of %d clock events failed", len(batch))
+            return False
+        return True
+
+    def _commit_alone(self, event):
+        event.error = None
+        event.result = None
+        try:
+            self._commit([event])
+        except Exception:
+            self.app.logger.exception(
+                "Commit of clock %s for employee %s failed", event.action, event.employee_id
+            )
+            event.error = SAVE_FAILED_MESSAGE
+            event.result = None
+
+    def _commit(self, batch):
+        with self.app.app_context():
+            use_site(self.site)
+            employee_ids = {event.employee_id for event in batch}
+            # Same rule as clock(): the latest open shift is the active one.
+            active_records = {}
+            for record in (
+                TimeRecord.query.filter(
+                    TimeRecord.employee_id.in_(employee_ids),
+                    TimeRecord.clock_out.is_(None)
+                )
+                .order_by(TimeRecord.clock_in)
+            ):
+                active_records[record.employee_id] = record
+
+            touched = []
+            for event in batch:
+                event.error, record = apply_clock_action(
+                    event.action, event.employee_id, active_records.get(event.employee_id), event.at
+                )
+                if event.error:
+                    continue
+                db.session.add(record)
+                if record.clock_out is None:
+                    active_records[event.employee_id] = record
+                else:
+                    active_records.pop(event.employee_id)
+                touched.append((event, record))
+
+            db.session.flush()
+            for event, record in touched:
+                event.result = {
+                    "record_id": record.id,
+                    "employee_id": record.employee_id,
+                    "clock_in": record.clock_in,
+                    "clock_out": record.clock_out,
+                }
+            db.session.commit()
+
+
+def is_enabled(app=None):
+    return (app or current_app).config["CLOCK_GROUP_COMMIT"]
+
+
+def _site_writer():
+    app = current_app._get_current_object()
+    site = current_site()
+    with _writers_lock:
+        writer = _writers.get(site)
+        if writer is None:
+            writer = GroupCommitWriter(
+                app,
+                site,
+                app.config["CLOCK_GROUP_COMMIT_WINDOW_MS"] / 1000,
+                app.config["CLOCK_GROUP_COMMIT_MAX_BATCH"]
+            )
+            _writers[site] = writer
+    return writer
+
+
+def submit_clock_event(employee_id, action, at):
+    """Queue a clock in/out for the current site and wait until it is committed.
+
+    Returns (error message or None, committed record values or None).
+    """
+    return _site_writer().submit(employee_id, action, at)
+
+
+async def submit_clock_event_async(employee_id, action, at):
+    """Awaitable submit_clock_event() for async views; no thread waits on the commit."""
+    return await _site_writer().submit_async(employee_id, action, at)
+
+
+def init_app(app):
+    app.config.setdefault("CLOCK_GROUP_COMMIT", os.getenv("CLOCK_GROUP_COMMIT", "0") == "1")
+    app.config.setdefault(
+        "CLOCK_GROUP_COMMIT_WINDOW_MS", float(os.getenv("CLOCK_GROUP_COMMIT_WINDOW_MS", "5"))
+    )
+    app.config.setdefault(
+        "CLOCK_GROUP_COMMIT_MAX_BATCH", int(os.getenv("CLOCK_GROUP_COMMIT_MAX_BATCH", "64"))
+    )
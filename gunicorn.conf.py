@@ -0,0 +1,47 @@
+"""Gunicorn settings for production: ``gunicorn -c gunicorn.conf.py wsgi:application``.
+
+Every setting can be overridden with the environment variable next to it.
+"""
+import multiprocessing
+import os
+import signal
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Threads, because each open live board holds one for as long as it is open.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Build the app and upgrade the schema once in the master, then fork.
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# How long a stopping worker may spend finishing in-flight requests.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    from wsgi import after_fork, application
+
+    after_fork(application)
+
+
+def post_worker_init(worker):
+    # Runs after the worker has set up its signal handlers and before it
+    # accepts connections, so no request ever lands on a cold worker.
+    from wsgi import application, close_streams, warm_up
+
+    worker.log.info("Worker %s warmed up in %.0f ms", worker.pid, warm_up(application))
+
+    handle_exit = worker.handle_exit
+
+    def handle_exit_and_close_streams(signum, frame):
+        close_streams()
+        handle_exit(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_exit_and_close_streams)
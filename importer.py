@@ -0,0 +1,174 @@
+import csv
+import io
+import tempfile
+from datetime import datetime
+
+from extensions import db
+from fragments import bump_roster_version
+from journal import record_bulk
+from models import Employee, TimeRecord, employee_field_error
+
+BATCH_SIZE = 2000
+MAX_REPORTED_REJECTIONS = 200
+EMPLOYEE_COLUMNS = ("first_name", "last_name", "employee_code")
+TIME_RECORD_COLUMNS = ("employee_code", "clock_in")
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+def _blank_result():
+    return {"imported": 0, "rejected": 0, "rejections": [], "error": None}
+
+
+def _reject(result, line_number, message):
+    result["rejected"] += 1
+    if len(result["rejections"]) < MAX_REPORTED_REJECTIONS:
+        result["rejections"].append({"line": line_number, "message": message})
+
+
+def _missing_columns(reader, required):
+    fieldnames = [name.strip() for name in (reader.fieldnames or [])]
+    reader.fieldnames = fieldnames
+    return [column for column in required if column not in fieldnames]
+
+
+def _parse_timestamp(value):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _flush(table, batch, result):
+    if not batch:
+        return
+    # A list of parameter sets makes SQLAlchemy use the driver's executemany.
+    db.session.execute(table.insert(), batch)
+    db.session.commit()
+    result["imported"] += len(batch)
+    batch.clear()
+
+
+def _journal_time_records(batch):
+    dates = [
+        value.date()
+        for row in batch
+        for value in (row["clock_in"], row["clock_out"])
+        if value is not None
+    ]
+    record_bulk("time_record", min(dates), max(dates))
+
+
+def import_employees(text_stream):
+    """Import first_name,last_name,employee_code[,is_manager] rows from a CSV text stream."""
+    result = _blank_result()
+    reader = csv.DictReader(text_stream)
+    missing = _missing_columns(reader, EMPLOYEE_COLUMNS)
+    if missing:
+        result["error"] = f"Missing columns: {', '.join(missing)}."
+        return result
+
+    used_codes = {code for (code,) in db.session.query(Employee.employee_code)}
+    batch = []
+    for row in reader:
+        first_name = (row.get("first_name") or "").strip()
+        last_name = (row.get("last_name") or "").strip()
+        employee_code = (row.get("employee_code") or "").strip()
+
+        field_error = employee_field_error(first_name, last_name, employee_code)
+        if field_error:
+            _reject(result, reader.line_num, field_error)
+            continue
+        if employee_code in used_codes:
+            _reject(result, reader.line_num, "That employee code is already in use.")
+            continue
+
+        used_codes.add(employee_code)
+        batch.append({
+            "name": f"{first_name} {last_name}",
+            "employee_code": employee_code,
+            "is_manager": (row.get("is_manager") or "").strip().lower() in TRUE_VALUES,
+        })
+        if len(batch) >= BATCH_SIZE:
+            bump_roster_version()
+            record_bulk("employee")
+            _flush(Employee.__table__, batch, result)
+
+    if batch:
+        bump_roster_version()
+        record_bulk("employee")
+        _flush(Employee.__table__, batch, result)
+    return result
+
+
+def import_time_records(text_stream):
+    """Import employee_code,clock_in[,clock_out] rows from a CSV text stream."""
+    result = _blank_result()
+    reader = csv.DictReader(text_stream)
+    missing = _missing_columns(reader, TIME_RECORD_COLUMNS)
+    if missing:
+        result["error"] = f"Missing columns: {', '.join(missing)}."
+        return result
+
+    employee_ids = dict(db.session.query(Employee.employee_code, Employee.id))
+    open_shift_ids = {
+        employee_id
+        for (employee_id,) in db.session.query(TimeRecord.employee_id).filter(
+            TimeRecord.clock_out.is_(None)
+        )
+    }
+    batch = []
+    for row in reader:
+        employee_id = employee_ids.get((row.get("employee_code") or "").strip())
+        if not employee_id:
+            _reject(result, reader.line_num, "Employee not found.")
+            continue
+
+        clock_in = _parse_timestamp(row.get("clock_in"))
+        if not clock_in:
+            _reject(result, reader.line_num, "Enter a valid clock-in time.")
+            continue
+        clock_out_value = (row.get("clock_out") or "").strip()
+        clock_out = _parse_timestamp(clock_out_value)
+        if clock_out_value and not clock_out:
+            _reject(result, reader.line_num, "Enter a valid clock-out time.")
+            continue
+        if clock_out and clock_out < clock_in:
+            _reject(result, reader.line_num, "Clock-out must be after clock-in.")
+            continue
+        if not clock_out:
+            if employee_id in open_shift_ids:
+                _reject(result, reader.line_num, "Employee already has an active shift.")
+                continue
+            open_shift_ids.add(employee_id)
+
+        batch.append({"employee_id": employee_id, "clock_in": clock_in, "clock_out": clock_out})
+        if len(batch) >= BATCH_SIZE:
+            _journal_time_records(batch)
+            _flush(TimeRecord.__table__, batch, result)
+
+    if batch:
+        _journal_time_records(batch)
+        _flush(TimeRecord.__table__, batch, result)
+    return result
+
+
+def upload_text_stream(upload):
+    """Read an uploaded file as UTF-8 text without loading it into memory.
+
+    Werkzeug spools uploads to a SpooledTemporaryFile, which has no
+    readable() before Python 3.11, so TextIOWrapper wraps the file it spools
+    to (memory up to 500 KB, disk beyond) instead.
+    """
+    stream = upload.stream
+    if isinstance(stream, tempfile.SpooledTemporaryFile):
+        stream = stream._file
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+IMPORTERS = {
+    "employees": import_employees,
+    "time_records": import_time_records,
+}
@@ -0,0 +1,122 @@
+"""Append-only change journal for payroll data.
+
+Every ORM flush that touches a time record, bonus, hours adjustment or employee
+appends a row to change_journal in the same transaction, so the journal can't
+disagree with the data. Bulk Core inserts (the CSV importer) call record_bulk().
+Caches remember the sequence they were built at and ask changes_since() whether
+anything in their date range moved, instead of re-reading the source tables.
+Nightly maintenance prunes rows older than MAINTENANCE_JOURNAL_DAYS, after
+deleting any cached export that would still need them (see maintenance.py).
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, event, func, inspect, or_
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import ChangeJournal, Employee, EmployeeBonus, EmployeeHoursAdjustment, TimeRecord
+
+TRACKED_ENTITIES = {
+    TimeRecord: "time_record",
+    EmployeeBonus: "bonus",
+    EmployeeHoursAdjustment: "adjustment",
+    Employee: "employee",
+}
+RANGE_ATTRIBUTES = {
+    TimeRecord: ("clock_in", "clock_out"),
+    EmployeeBonus: ("period_start", "period_end"),
+    EmployeeHoursAdjustment: ("period_start", "period_end"),
+}
+
+
+def _affected_range(instance):
+    """Return (first date, last date) covered by the old and new values, or (None, None)."""
+    attributes = RANGE_ATTRIBUTES.get(type(instance))
+    if not attributes:
+        return None, None
+    state = inspect(instance)
+    dates = []
+    for name in attributes:
+        history = state.attrs[name].history
+        for value in (*history.added, *history.unchanged, *history.deleted):
+            if value is not None:
+                dates.append(value.date() if isinstance(value, datetime) else value)
+    if not dates:
+        return None, None
+    return min(dates), max(dates)
+
+
+def _journal_row(instance, operation, changed_at):
+    range_start, range_end = _affected_range(instance)
+    employee_id = instance.id if isinstance(instance, Employee) else instance.employee_id
+    return {
+        "entity": TRACKED_ENTITIES[type(instance)],
+        "entity_id": instance.id,
+        "employee_id": employee_id,
+        "operation": operation,
+        "range_start": range_start,
+        "range_end": range_end,
+        "changed_at": changed_at,
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    # Runs before the flushed state is reset, so new/dirty/deleted and the
+    # attribute history still describe what this flush wrote.
+    changed_at = datetime.now()
+    rows = []
+    for operation, instances in (
+        ("insert", session.new), ("update", session.dirty), ("delete", session.deleted)
+    ):
+        for instance in instances:
+            if type(instance) not in TRACKED_ENTITIES:
+                continue
+            if operation == "update" and not session.is_modified(instance, include_collections=False):
+                continue
+            rows.append(_journal_row(instance, operation, changed_at))
+    if rows:
+        session.connection().execute(ChangeJournal.__table__.insert(), rows)
+
+
+def record_bulk(entity, range_start=None, range_end=None, operation="insert"):
+    """Journal a bulk write that bypassed the ORM, in the caller's transaction."""
+    db.session.execute(ChangeJournal.__table__.insert(), [{
+        "entity": entity,
+        "operation": operation,
+        "range_start": range_start,
+        "range_end": range_end,
+        "changed_at": datetime.now(),
+    }])
+
+
+def latest_seq():
+    return db.session.query(func.max(ChangeJournal.seq)).scalar() or 0
+
+
+def _overlapping(query, range_start, range_end):
+    return query.filter(or_(
+        ChangeJournal.range_start.is_(None),
+        and_(ChangeJournal.range_start <= range_end, ChangeJournal.range_end >= range_start)
+    ))
+
+
+def changes_since(seq, range_start=None, range_end=None, limit=None):
+    """Return journal rows after seq, oldest first, optionally only those touching [range_start, range_end].
+
+    The seq filter is a primary-key range scan, so a caller that is up to date
+    pays for an empty index probe.
+    """
+    query = ChangeJournal.query.filter(ChangeJournal.seq > seq)
+    if range_start and range_end:
+        query = _overlapping(query, range_start, range_end)
+    query = query.order_by(ChangeJournal.seq)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def changed_since(seq, range_start, range_end):
+    """True when anything affecting [range_start, range_end] was journaled after seq."""
+    query = _overlapping(ChangeJournal.query.filter(ChangeJournal.seq > seq), range_start, range_end)
+    return db.session.query(query.exists()).scalar()
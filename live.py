@@ -0,0 +1,200 @@
+"""Live board plumbing: an in-process hub of open boards, fed from every site's change journal.
+
+Each server process has its own hub, but every process writes and reads the
+same change_journal. One feed thread per process polls the journal of each
+site every FEED_POLL_SECONDS and publishes the shifts that changed, so a board
+sees punches handled by any worker, the importer and the command-line tools.
+"""
+import json
+import queue
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
+from journal import changes_since, latest_seq
+from models import TimeRecord
+from sites import current_site, fan_out, use_site
+
+KEEPALIVE_SECONDS = 15
+FEED_POLL_SECONDS = 1
+# More changes than this in one poll and boards reload the snapshot instead.
+FEED_MAX_EVENTS = 500
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+class ClockEventHub:
+    """In-process publish/subscribe hub that fans clock events out to live boards."""
+
+    def __init__(self, max_queue_size=256):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._max_queue_size = max_queue_size
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self._max_queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def close(self):
+        """End every open stream, e.g. when the worker is shutting down; boards reconnect elsewhere."""
+        self.publish({"type": "close"})
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A board that fell behind gets a fresh snapshot instead of a backlog.
+                _drain(subscriber)
+                subscriber.put_nowait({"type": "resync"})
+
+
+def shift_payload(event_type, record_id, employee_id, employee_name, clock_in, clock_out):
+    return {
+        "type": event_type,
+        "site": current_site(),
+        "record_id": record_id,
+        "employee_id": employee_id,
+        "employee": employee_name,
+        "clock_in": clock_in.isoformat(),
+        "clock_out": clock_out.isoformat() if clock_out else None,
+    }
+
+
+def shift_event(record, event_type):
+    return shift_payload(
+        event_type, record.id, record.employee_id, record.employee.name,
+        record.clock_in, record.clock_out
+    )
+
+
+def _journal_events(rows):
+    """Turn journal rows into board events, or None when boards should reload the snapshot."""
+    inserted = {}
+    for row in rows:
+        if row.entity == "employee" and row.operation == "insert":
+            continue  # A new employee has no shifts yet.
+        if row.entity not in ("time_record", "employee"):
+            continue
+        # Deletes, bulk imports and renames can't be replayed shift by shift.
+        if row.entity == "employee" or row.operation == "delete" or row.entity_id is None:
+            return None
+        inserted[row.entity_id] = inserted.get(row.entity_id, False) or row.operation == "insert"
+    if not inserted:
+        return []
+    records = (
+        TimeRecord.query.options(joinedload(TimeRecord.employee))
+        .filter(TimeRecord.id.in_(inserted))
+        .order_by(TimeRecord.clock_in)
+    )
+    return [
+        shift_event(record, "clock_in" if inserted[record.id] else "shift_updated")
+        for record in records
+    ]
+
+
+class JournalFeed:
+    """Thread that publishes every site's journaled shift changes to this process's hub."""
+
+    def __init__(self, app, hub, seqs):
+        self.app = app
+        self.hub = hub
+        self._seqs = seqs
+        self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(FEED_POLL_SECONDS)
+            for site in list(self._seqs):
+                try:
+                    self._poll(site)
+                except Exception:
+                    self.app.logger.exception("Live board feed for site %s failed", site)
+
+    def _poll(self, site):
+        with self.app.app_context():
+            use_site(site)
+            rows = changes_since(self._seqs[site], limit=FEED_MAX_EVENTS + 1)
+            if not rows:
+                return
+            # Read before checking for boards: one that subscribes after this
+            # poll takes its snapshot after these changes were committed.
+            if not self.hub.subscriber_count():
+                self._seqs[site] = rows[-1].seq
+                return
+            if len(rows) > FEED_MAX_EVENTS:
+                self._seqs[site] = latest_seq()
+                events = None
+            else:
+                self._seqs[site] = rows[-1].seq
+                events = _journal_events(rows)
+        if events is None:
+            self.hub.publish({"type": "resync"})
+            return
+        for event in events:
+            self.hub.publish(event)
+
+
+def start_feed(app=None):
+    """Start this process's journal feed; called when a board connects, before it subscribes.
+
+    The starting sequences are read before the board's snapshot, so nothing
+    committed in between is missed.
+    """
+    global _feed
+    app = app or current_app._get_current_object()
+    with _feed_lock:
+        if _feed is None:
+            _feed = JournalFeed(app, hub, fan_out(latest_seq))
+    return _feed
+
+
+def _drain(subscriber):
+    while True:
+        try:
+            subscriber.get_nowait()
+        except queue.Empty:
+            return
+
+
+def format_sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_events(subscriber, hub, snapshot, keepalive_seconds=KEEPALIVE_SECONDS):
+    """Yield SSE frames for one board: a snapshot first, then hub events as they arrive."""
+    try:
+        yield format_sse("snapshot", snapshot())
+        while True:
+            try:
+                event = subscriber.get(timeout=keepalive_seconds)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if event.get("type") == "close":
+                return
+            if event.get("type") == "resync":
+                yield format_sse("snapshot", snapshot())
+            else:
+                yield format_sse("shift", event)
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+hub = ClockEventHub()
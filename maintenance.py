@@ -0,0 +1,392 @@
+"""Scheduled SQLite maintenance: statistics, journal pruning, incremental vacuum, integrity checks and backups.
+
+A background thread in each server process (started by app.py, asgi.py and
+the gunicorn workers) wakes every MAINTENANCE_POLL_SECONDS and, inside
+MAINTENANCE_WINDOW (local time, default 01:00-05:00) on nights that are not a
+pay period boundary, runs each task in MAINTENANCE_TASKS once per site. Work is
+split into short statements (one table, one chunk of pages) and each runs under
+a deadline of MAINTENANCE_STEP_SECONDS, so a clock-in waiting on the database
+lock is never held up longer than that. A step that runs past the deadline is
+interrupted and the task tries again the next night. Runs are logged and kept
+in maintenance_run; a run still "running" after MAINTENANCE_TASK_SECONDS is
+marked "stale". The backup (see backup.py) also runs on pay period
+boundary nights, since it only reads the database.
+
+Databases created before incremental auto-vacuum need one full VACUUM to
+switch, which holds the database for as long as it takes; it is never
+scheduled, and the nightly vacuum is skipped until someone runs it.
+
+    python maintenance.py                            # every task, every site, now
+    python maintenance.py --task quick_check --site main
+    python maintenance.py --task convert_auto_vacuum  # once, off-hours, for older databases
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+import backup
+from export_formats import discard_cached_exports
+from extensions import db
+from models import MaintenanceRun
+from pay_periods import is_pay_period_boundary
+from sites import site_engines, site_names, use_site
+
+# Progress handler granularity in SQLite VM instructions; small enough that the
+# deadline is noticed within a millisecond or so.
+PROGRESS_INSTRUCTIONS = 1000
+AUTO_VACUUM_INCREMENTAL = 2
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+@contextmanager
+def _deadline(connection, seconds):
+    """Interrupt any statement on connection that runs longer than seconds (0 = no limit)."""
+    if not seconds:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    connection.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_INSTRUCTIONS)
+    try:
+        yield
+    finally:
+        connection.set_progress_handler(None, 0)
+
+
+def _pragma(connection, statement):
+    return connection.execute(f"PRAGMA {statement}").fetchone()[0]
+
+
+def _database_bytes(connection):
+    return _pragma(connection, "page_count") * _pragma(connection, "page_size")
+
+
+def _tables(connection):
+    return [
+        row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+    ]
+
+
+def analyze(connection, config):
+    """Refresh planner statistics one table at a time, sampling at most analysis_limit rows per index."""
+    connection.execute(f"PRAGMA analysis_limit = {int(config['MAINTENANCE_ANALYSIS_LIMIT'])}")
+    tables = _tables(connection)
+    for table in tables:
+        with _deadline(connection, config["MAINTENANCE_STEP_SECONDS"]):
+            connection.execute(f'ANALYZE "{table}"')
+        time.sleep(config["MAINTENANCE_PAUSE_SECONDS"])
+    with _deadline(connection, config["MAINTENANCE_STEP_SECONDS"]):
+        connection.execute("PRAGMA optimize")
+    return "ok", 0, f"analyzed {len(tables)} tables"
+
+
+def _journal_prune_bound(connection, cutoff, config):
+    """Return the last seq journaled before cutoff, walking change_journal in seq order a chunk at a time."""
+    chunk_rows = int(config["MAINTENANCE_JOURNAL_CHUNK_ROWS"])
+    bound = 0
+    while True:
+        with _deadline(connection, config["MAINTENANCE_STEP_SECONDS"]):
+            rows = connection.execute(
+                "SELECT seq, changed_at FROM change_journal WHERE seq > ? ORDER BY seq LIMIT ?", (bound, chunk_rows)
+            ).fetchall()
+        for seq, changed_at in rows:
+            if changed_at >= cutoff:
+                return bound
+            bound = seq
+        if len(rows) < chunk_rows:
+            return bound
+
+
+def prune_change_journal(connection, config):
+    """Delete change_journal rows older than MAINTENANCE_JOURNAL_DAYS, oldest first, a chunk at a time.
+
+    The live board only reads the last few seconds of the journal. Cached
+    exports check it from the sequence they were built at, so those built
+    before the rows being deleted are discarded first and re-render when next
+    downloaded.
+    """
+    chunk_rows = int(config["MAINTENANCE_JOURNAL_CHUNK_ROWS"])
+    cutoff = datetime.now() - timedelta(days=config["MAINTENANCE_JOURNAL_DAYS"])
+    # changed_at is stored as ISO text, so it compares as a string.
+    bound = _journal_prune_bound(connection, cutoff.isoformat(sep=" "), config)
+    # Keep the newest row, so latest_seq() never goes backwards.
+    newest = connection.execute("SELECT MAX(seq) FROM change_journal").fetchone()[0] or 0
+    bound = min(bound, newest - 1)
+    if bound <= 0:
+        return "ok", 0, "nothing to prune"
+    exports = discard_cached_exports(bound)
+
+    give_up_at = time.monotonic() + config["MAINTENANCE_TASK_SECONDS"]
+    deleted = 0
+    while time.monotonic() < give_up_at:
+        with _deadline(connection, config["MAINTENANCE_STEP_SECONDS"]):
+            chunk = connection.execute(
+                "DELETE FROM change_journal WHERE seq IN "
+                "(SELECT seq FROM change_journal WHERE seq <= ? ORDER BY seq LIMIT ?)",
+                (bound, chunk_rows)
+            ).rowcount
+        deleted += chunk
+        if chunk < chunk_rows:
+            return "ok", 0, f"deleted {deleted} rows through seq {bound}, {exports} cached exports"
+        time.sleep(config["MAINTENANCE_PAUSE_SECONDS"])
+    return "partial", 0, f"deleted {deleted} rows toward seq {bound}, {exports} cached exports"
+
+
+def incremental_vacuum(connection, config):
+    """Return free pages to the filesystem a chunk at a time."""
+    if _pragma(connection, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+        # A full VACUUM would outlast the step deadline every night; see convert_auto_vacuum.
+        return "skipped", 0, "needs one-time VACUUM: python maintenance.py --task convert_auto_vacuum"
+
+    bytes_before = _database_bytes(connection)
+    chunk_pages = int(config["MAINTENANCE_VACUUM_CHUNK_PAGES"])
+    give_up_at = time.monotonic() + config["MAINTENANCE_TASK_SECONDS"]
+    chunks = 0
+    while _pragma(connection, "freelist_count") and time.monotonic() < give_up_at:
+        with _deadline(connection, config["MAINTENANCE_STEP_SECONDS"]):
+            # execute() steps a statement once, which frees a single page;
+            # executescript() runs the pragma to completion.
+            connection.executescript(f"PRAGMA incremental_vacuum({chunk_pages})")
+        chunks += 1
+        time.sleep(config["MAINTENANCE_PAUSE_SECONDS"])
+    remaining = _pragma(connection, "freelist_count")
+    status = "ok" if not remaining else "partial"
+    detail = f"{chunks} chunks, {remaining} free pages left"
+    return status, bytes_before - _database_bytes(connection), detail
+
+
+def convert_auto_vacuum(connection, config):
+    """Switch a database created before incremental auto-vacuum with one full VACUUM.
+
+    The VACUUM rewrites the whole file and holds the database until it is done,
+    so it runs without the step deadline and only when asked for.
+    """
+    if _pragma(connection, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL:
+        return "skipped", 0, "already incremental"
+    bytes_before = _database_bytes(connection)
+    connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    connection.execute("VACUUM")
+    return "ok", bytes_before - _database_bytes(connection), "converted to incremental auto-vacuum"
+
+
+def quick_check(connection, config):
+    """Run PRAGMA quick_check table by table and report anything other than ok."""
+    problems = []
+    tables = _tables(connection)
+    for table in tables:
+        with _deadline(connection, config["MAINTENANCE_STEP_SECONDS"]):
+            results = [row[0] for row in connection.execute(f'PRAGMA quick_check("{table}")')]
+        problems.extend(result for result in results if result != "ok")
+        time.sleep(config["MAINTENANCE_PAUSE_SECONDS"])
+    if problems:
+        return "failed", 0, "; ".join(problems[:20])
+    return "ok", 0, f"checked {len(tables)} tables"
+
+
+# Run in this order; each is called as task(sqlite3 connection, app config)
+# and returns (status, bytes reclaimed, detail).
+MAINTENANCE_TASKS = {
+    "analyze": analyze,
+    # Before the vacuum, so the pages it frees are returned the same night.
+    "prune_change_journal": prune_change_journal,
+    "incremental_vacuum": incremental_vacuum,
+    "quick_check": quick_check,
+    "backup": backup.backup,
+}
+# Tasks that still run on pay period boundary nights.
+BOUNDARY_NIGHT_TASKS = ("backup",)
+# Run only when named with --task, never by the scheduler.
+MANUAL_TASKS = {
+    "convert_auto_vacuum": convert_auto_vacuum,
+}
+
+
+def _mark_stale_runs(config):
+    """Close out runs still "running" after MAINTENANCE_TASK_SECONDS; their process died mid-task."""
+    cutoff = datetime.now() - timedelta(seconds=config["MAINTENANCE_TASK_SECONDS"])
+    db.session.execute(
+        update(MaintenanceRun)
+        .where(MaintenanceRun.status == "running", MaintenanceRun.started_at < cutoff)
+        .values(status="stale", detail="never finished; the process running it stopped")
+    )
+
+
+def run_task(site, name, scheduled_for=None):
+    """Run one maintenance task against site's database and return its MaintenanceRun.
+
+    With scheduled_for, returns None when another process already ran the task
+    for that night.
+    """
+    use_site(site)
+    engine = site_engines()[site]
+    _mark_stale_runs(current_app.config)
+    run = MaintenanceRun(task=name, scheduled_for=scheduled_for)
+    db.session.add(run)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    if engine.dialect.name != "sqlite":
+        run.status, run.detail = "skipped", f"not supported on {engine.dialect.name}"
+        run.duration_ms = 0
+        db.session.commit()
+        return run
+
+    config = current_app.config
+    started = time.perf_counter()
+    try:
+        # Autocommit, so every statement is its own short transaction.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            task = MAINTENANCE_TASKS.get(name) or MANUAL_TASKS[name]
+            status, bytes_reclaimed, detail = task(connection.connection.driver_connection, config)
+    except sqlite3.Error as exc:
+        interrupted = str(exc) == "interrupted"
+        status, bytes_reclaimed = ("interrupted" if interrupted else "failed"), 0
+        detail = (
+            f"step ran past {config['MAINTENANCE_STEP_SECONDS']}s and was stopped"
+            if interrupted else f"{type(exc).__name__}: {exc}"
+        )
+    run.status = status
+    run.bytes_reclaimed = bytes_reclaimed
+    run.detail = detail
+    run.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    db.session.commit()
+
+    log = current_app.logger.info if status in ("ok", "partial") else current_app.logger.warning
+    log(
+        "Maintenance %s on site %s: %s in %.0f ms, %d bytes reclaimed (%s)",
+        name, site, status, run.duration_ms, bytes_reclaimed, detail
+    )
+    return run
+
+
+def parse_window(value):
+    """Parse ``HH:MM-HH:MM`` into (start, end) times; an empty value disables the scheduler."""
+    if not value:
+        return None
+    start, separator, end = value.partition("-")
+    if not separator:
+        raise ValueError(f"Invalid MAINTENANCE_WINDOW: {value!r}")
+    return (
+        datetime.strptime(start.strip(), "%H:%M").time(),
+        datetime.strptime(end.strip(), "%H:%M").time(),
+    )
+
+
+def window_night(now, window):
+    """Return the date of the maintenance night now falls in, or None outside the window.
+
+    A window that wraps past midnight (23:00-04:00) belongs to the night it started.
+    """
+    start, end = window
+    current = now.time()
+    if start <= end:
+        return now.date() if start <= current < end else None
+    if current >= start:
+        return now.date()
+    if current < end:
+        return now.date() - timedelta(days=1)
+    return None
+
+
+class MaintenanceScheduler:
+    """Thread that runs every maintenance task once per site per night."""
+
+    def __init__(self, app):
+        self.app = app
+        self.window = parse_window(app.config["MAINTENANCE_WINDOW"])
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.app.config["MAINTENANCE_POLL_SECONDS"])
+            night = window_night(datetime.now(), self.window)
+            if night is None:
+                continue
+            # Payroll is closed out on boundary days; only take the backup.
+            names = BOUNDARY_NIGHT_TASKS if is_pay_period_boundary(night) else MAINTENANCE_TASKS
+            with self.app.app_context():
+                for site in site_names():
+                    for name in names:
+                        try:
+                            run_task(site, name, scheduled_for=night)
+                        except Exception:
+                            self.app.logger.exception("Maintenance %s for site %s failed", name, site)
+                        finally:
+                            db.session.remove()
+
+
+def start_scheduler(app=None):
+    """Start this process's scheduler unless MAINTENANCE_WINDOW is empty; server entry points call this."""
+    global _scheduler
+    app = app or current_app._get_current_object()
+    if not app.config["MAINTENANCE_WINDOW"]:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = MaintenanceScheduler(app)
+    return _scheduler
+
+
+def restart_after_fork(app):
+    """Threads don't survive fork(); give a forked server worker its own scheduler."""
+    global _scheduler
+    _scheduler = None
+    start_scheduler(app)
+
+
+def init_app(app):
+    app.config.setdefault("MAINTENANCE_WINDOW", os.getenv("MAINTENANCE_WINDOW", "01:00-05:00"))
+    app.config.setdefault("MAINTENANCE_POLL_SECONDS", float(os.getenv("MAINTENANCE_POLL_SECONDS", "300")))
+    app.config.setdefault("MAINTENANCE_STEP_SECONDS", float(os.getenv("MAINTENANCE_STEP_SECONDS", "1")))
+    app.config.setdefault("MAINTENANCE_PAUSE_SECONDS", float(os.getenv("MAINTENANCE_PAUSE_SECONDS", "0.2")))
+    app.config.setdefault("MAINTENANCE_TASK_SECONDS", float(os.getenv("MAINTENANCE_TASK_SECONDS", "600")))
+    app.config.setdefault("MAINTENANCE_VACUUM_CHUNK_PAGES", int(os.getenv("MAINTENANCE_VACUUM_CHUNK_PAGES", "256")))
+    app.config.setdefault("MAINTENANCE_ANALYSIS_LIMIT", int(os.getenv("MAINTENANCE_ANALYSIS_LIMIT", "1000")))
+    app.config.setdefault("MAINTENANCE_JOURNAL_DAYS", float(os.getenv("MAINTENANCE_JOURNAL_DAYS", "30")))
+    app.config.setdefault("MAINTENANCE_JOURNAL_CHUNK_ROWS", int(os.getenv("MAINTENANCE_JOURNAL_CHUNK_ROWS", "5000")))
+    # Not started here: CLIs, the reloader parent and a preforking master build
+    # apps too. Servers call start_scheduler() once they are serving.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run database maintenance now.")
+    parser.add_argument("--site", action="append", help="site to maintain (repeatable; default: all)")
+    parser.add_argument("--task", action="append", choices=[*MAINTENANCE_TASKS, *MANUAL_TASKS],
+                        help="task to run (repeatable; default: every nightly task)")
+    parser.add_argument("--step-seconds", type=float,
+                        help="override MAINTENANCE_STEP_SECONDS; 0 lets a step hold the database as long as it needs")
+    args = parser.parse_args()
+
+    from app import create_app
+    from migrations import upgrade_all
+
+    app = create_app()
+    if args.step_seconds is not None:
+        app.config["MAINTENANCE_STEP_SECONDS"] = args.step_seconds
+    with app.app_context():
+        upgrade_all()
+        for site in args.site or site_names():
+            for name in args.task or MAINTENANCE_TASKS:
+                run = run_task(site, name)
+                print(
+                    f"{site:<12} {name:<20} {run.status:<12} {run.duration_ms:>9.1f} ms "
+                    f"{run.bytes_reclaimed:>12} bytes  {run.detail}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from sqlalchemy import inspect, text, update
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from extensions import db
+from models import (
+    CacheVersion, ChangeJournal, EmployeeBonus, EmployeeHoursAdjustment, MaintenanceRun,
+    OutboxMessage, TimeRecord, employee_name_search_index
+)
+from pay_periods import pay_period_index_expr
+
+
+def _add_column_if_missing(connection, table_name, column_name, ddl):
+    columns = {column["name"] for column in inspect(connection).get_columns(table_name)}
+    if column_name not in columns:
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
+
+
+def _baseline(connection):
+    # Databases created before versioning may predate some tables or the
+    # is_manager column; fill in whatever is missing.
+    db.metadata.create_all(bind=connection)
+    _add_column_if_missing(
+        connection, "employee", "is_manager", "is_manager BOOLEAN NOT NULL DEFAULT 0"
+    )
+
+
+def _cache_versions(connection):
+    CacheVersion.__table__.create(bind=connection, checkfirst=True)
+
+
+def _employee_name_search_index(connection):
+    employee_name_search_index.create(bind=connection, checkfirst=True)
+
+
+def _outbox(connection):
+    OutboxMessage.__table__.create(bind=connection, checkfirst=True)
+
+
+def _change_journal(connection):
+    ChangeJournal.__table__.create(bind=connection, checkfirst=True)
+
+
+def _maintenance_runs(connection):
+    MaintenanceRun.__table__.create(bind=connection, checkfirst=True)
+
+
+def _hot_query_indexes(connection):
+    names = {
+        "ix_time_record_employee_clock_in", "ix_time_record_clock_in", "ix_time_record_open",
+        "ix_employee_bonus_period", "ix_employee_hours_adjustment_period",
+    }
+    for table in (TimeRecord.__table__, EmployeeBonus.__table__, EmployeeHoursAdjustment.__table__):
+        for index in table.indexes:
+            if index.name in names:
+                index.create(bind=connection, checkfirst=True)
+
+
+def _time_record_pay_period_index(connection):
+    _add_column_if_missing(connection, "time_record", "pay_period_index", "pay_period_index INTEGER")
+    table = TimeRecord.__table__
+    # One statement computes every row's period in SQL, the same way
+    # get_pay_period_index does in Python.
+    connection.execute(
+        update(table)
+        .where(table.c.pay_period_index.is_(None))
+        .values(pay_period_index=pay_period_index_expr(table.c.clock_in))
+    )
+    for index in table.indexes:
+        if index.name == "ix_time_record_pay_period":
+            index.create(bind=connection, checkfirst=True)
+
+
+# Append new migrations to the end; never renumber or edit a shipped one.
+MIGRATIONS = [
+    (1, "Baseline tables and employee.is_manager", _baseline),
+    (2, "cache_version table for fragment cache keys", _cache_versions),
+    (3, "lower(employee.name) index for employee search", _employee_name_search_index),
+    (4, "outbox_message table for background email delivery", _outbox),
+    (5, "change_journal table for change data capture", _change_journal),
+    (6, "maintenance_run table for scheduled database maintenance", _maintenance_runs),
+    (7, "time_record, bonus and adjustment indexes for hot queries", _hot_query_indexes),
+    (8, "time_record.pay_period_index column, backfilled and indexed", _time_record_pay_period_index),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(engine):
+    """Return the stamped schema version, or None when the database is unversioned."""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT version FROM schema_version")).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def _stamp(connection, version):
+    connection.execute(text("UPDATE schema_version SET version = :version"), {"version": version})
+
+
+def upgrade(engine=None):
+    """Bring the database up to LATEST_VERSION and return the resulting version.
+
+    A current database costs a single read of schema_version.
+    """
+    engine = engine or db.engine
+    version = current_version(engine)
+    if version == LATEST_VERSION:
+        return version
+
+    if version is None:
+        with engine.begin() as connection:
+            has_tables = bool(inspect(connection).get_table_names())
+            if not has_tables and connection.dialect.name == "sqlite":
+                # Only settable before the first table exists; lets maintenance
+                # return free pages a chunk at a time (see maintenance.py).
+                connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+            connection.execute(text("INSERT INTO schema_version (version) VALUES (0)"))
+            if not has_tables:
+                # A fresh database gets the current models directly.
+                db.metadata.create_all(bind=connection)
+                _stamp(connection, LATEST_VERSION)
+                return LATEST_VERSION
+        version = 0
+
+    for number, _description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            _stamp(connection, number)
+        version = number
+    return version
+
+
+def upgrade_all():
+    """Upgrade the database of every configured site and return {site: version}."""
+    from sites import site_engines
+
+    return {site: upgrade(engine) for site, engine in site_engines().items()}
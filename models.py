@@ -1,6 +1,21 @@
 from extensions import db
 from datetime import datetime
 
+from sqlalchemy import event
+
+from pay_periods import get_pay_period_index
+
+EMPLOYEE_CODE_LENGTH = 4
+
+
+def employee_field_error(first_name, last_name, employee_code):
+    """Return the validation message for employee form fields, or None when they are valid."""
+    if not first_name or not last_name or not employee_code:
+        return "First name, last name, and employee code are required."
+    if len(employee_code) != EMPLOYEE_CODE_LENGTH:
+        return "Employee code must be exactly 4 characters."
+    return None
+
 class Employee(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -10,11 +25,60 @@ class Employee(db.Model):
     bonuses = db.relationship('EmployeeBonus', backref='employee', lazy=True)
     hours_adjustments = db.relationship('EmployeeHoursAdjustment', backref='employee', lazy=True)
 
+
+# Case-insensitive prefix search on names is a range scan on this index.
+employee_name_search_index = db.Index("ix_employee_name_lower", db.func.lower(Employee.name))
+
 class TimeRecord(db.Model):
+    __table_args__ = (
+        # Per-employee lookups: active shift, period records and closed hours.
+        db.Index("ix_time_record_employee_clock_in", "employee_id", "clock_in"),
+        # Everyone's shifts in a date range: reports, totals and exports.
+        db.Index("ix_time_record_clock_in", "clock_in"),
+        # Open shifts only, so the live board reads a handful of rows however
+        # long the history grows.
+        db.Index("ix_time_record_open", "clock_in", sqlite_where=db.text("clock_out IS NULL")),
+        # Whole pay periods, for everyone or one employee, in clock-in order.
+        db.Index("ix_time_record_pay_period", "pay_period_index", "employee_id", "clock_in"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
     clock_in = db.Column(db.DateTime, default=datetime.utcnow)
     clock_out = db.Column(db.DateTime)
+    # get_pay_period_index(clock_in); set on every insert, including bulk Core
+    # inserts, and kept in step with clock_in by the before_update hook below.
+    pay_period_index = db.Column(db.Integer, default=lambda context: _clock_in_pay_period_index(
+        context.get_current_parameters().get("clock_in")
+    ))
+
+
+def _clock_in_pay_period_index(clock_in):
+    return get_pay_period_index(clock_in.date()) if clock_in else None
+
+
+@event.listens_for(TimeRecord, "before_update")
+def _update_pay_period_index(mapper, connection, target):
+    target.pay_period_index = _clock_in_pay_period_index(target.clock_in)
+
+
+def apply_clock_action(action, employee_id, active_record, at):
+    """Clock employee_id in or out at `at` against their active (latest open) shift.
+
+    Returns (error message, None) when the action isn't allowed, otherwise
+    (None, record): a new TimeRecord for the caller to add to its session, or
+    active_record with its clock-out set. The one rule shared by the kiosk
+    views and the group commit writer.
+    """
+    if action == "in":
+        if active_record:
+            return "You already have an active shift.", None
+        return None, TimeRecord(employee_id=employee_id, clock_in=at)
+    if action == "out":
+        if not active_record:
+            return "No active shift to clock out of.", None
+        active_record.clock_out = at
+        return None, active_record
+    return "Invalid action.", None
 
 
 class EmployeeBonus(db.Model):
@@ -25,6 +89,7 @@ class EmployeeBonus(db.Model):
             "period_end",
             name="uq_employee_bonus_period"
         ),
+        db.Index("ix_employee_bonus_period", "period_start", "period_end"),
     )
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
@@ -42,6 +107,7 @@ class EmployeeHoursAdjustment(db.Model):
             "period_end",
             name="uq_employee_hours_period"
         ),
+        db.Index("ix_employee_hours_adjustment_period", "period_start", "period_end"),
     )
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
@@ -49,3 +115,56 @@ class EmployeeHoursAdjustment(db.Model):
     period_end = db.Column(db.Date, nullable=False)
     adjusted_hours = db.Column(db.Float, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class CacheVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class OutboxMessage(db.Model):
+    __table_args__ = (
+        db.Index("ix_outbox_message_due", "status", "next_attempt_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(254), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    attachment_name = db.Column(db.String(200))
+    attachment_body = db.Column(db.Text)
+    status = db.Column(db.String(10), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    sent_at = db.Column(db.DateTime)
+
+
+class ChangeJournal(db.Model):
+    # AUTOINCREMENT so sequence numbers are never reused, even after pruning.
+    __table_args__ = {"sqlite_autoincrement": True}
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer)
+    employee_id = db.Column(db.Integer)
+    operation = db.Column(db.String(10), nullable=False)
+    # Dates whose figures may have changed; both NULL means every period.
+    range_start = db.Column(db.Date)
+    range_end = db.Column(db.Date)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+
+class MaintenanceRun(db.Model):
+    __table_args__ = (
+        # One scheduled run of each task per night, however many workers poll.
+        db.UniqueConstraint("scheduled_for", "task", name="uq_maintenance_run_night"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(30), nullable=False)
+    # Night the scheduler ran it for; NULL for runs started by hand.
+    scheduled_for = db.Column(db.Date)
+    status = db.Column(db.String(12), nullable=False, default="running")
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    duration_ms = db.Column(db.Float)
+    bytes_reclaimed = db.Column(db.Integer, nullable=False, default=0)
+    detail = db.Column(db.Text)
@@ -0,0 +1,257 @@
+"""Background email delivery through a database outbox.
+
+Requests only insert an OutboxMessage; a worker thread sends due messages over
+SMTP and retries failures with exponential backoff. For local testing run a
+debugging SMTP server that prints every message instead of delivering it:
+
+    python outbox.py --port 1025        # then set SMTP_HOST=localhost SMTP_PORT=1025
+"""
+import argparse
+import os
+import smtplib
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from flask import current_app
+from sqlalchemy import update
+
+from extensions import db
+from models import OutboxMessage
+from sites import site_names, use_site
+
+SEND_BATCH_SIZE = 20
+RECENT_MESSAGE_COUNT = 5
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enqueue_email(recipient, subject, body, attachment_name=None, attachment_body=None):
+    """Add a message to the current site's outbox as part of the caller's transaction."""
+    message = OutboxMessage(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        attachment_name=attachment_name,
+        attachment_body=attachment_body
+    )
+    db.session.add(message)
+    return message
+
+
+def notify():
+    """Call after committing new messages so delivery starts without waiting for the next poll."""
+    if _worker:
+        _worker.wake()
+
+
+def recent_messages(limit=RECENT_MESSAGE_COUNT):
+    return OutboxMessage.query.order_by(OutboxMessage.id.desc()).limit(limit).all()
+
+
+def retry_delay(attempts, base_seconds, max_seconds):
+    return timedelta(seconds=min(base_seconds * 2 ** (attempts - 1), max_seconds))
+
+
+def build_email(message, sender):
+    email = EmailMessage()
+    email["From"] = sender
+    email["To"] = message.recipient
+    email["Subject"] = message.subject
+    email.set_content(message.body)
+    if message.attachment_name:
+        email.add_attachment(
+            message.attachment_body or "", subtype="plain", filename=message.attachment_name
+        )
+    return email
+
+
+def send_email(email, config):
+    smtp_class = smtplib.SMTP_SSL if config["SMTP_SSL"] else smtplib.SMTP
+    with smtp_class(config["SMTP_HOST"], config["SMTP_PORT"], timeout=config["SMTP_TIMEOUT"]) as smtp:
+        if config["SMTP_STARTTLS"]:
+            smtp.starttls()
+        if config["SMTP_USERNAME"]:
+            smtp.login(config["SMTP_USERNAME"], config["SMTP_PASSWORD"])
+        smtp.send_message(email)
+
+
+class OutboxWorker:
+    """Thread that delivers due outbox messages for every site."""
+
+    def __init__(self, app):
+        self.app = app
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.app.config["OUTBOX_POLL_SECONDS"])
+            self._wake.clear()
+            with self.app.app_context():
+                for site in site_names():
+                    try:
+                        self.deliver_due(site)
+                    except Exception:
+                        self.app.logger.exception("Outbox delivery for site %s failed", site)
+                    finally:
+                        db.session.remove()
+
+    def deliver_due(self, site):
+        """Send every due message for site; return how many were sent."""
+        use_site(site)
+        config = self.app.config
+        now = datetime.now()
+        due = (
+            db.session.query(OutboxMessage.id, OutboxMessage.next_attempt_at).filter(
+                OutboxMessage.status == "pending",
+                OutboxMessage.next_attempt_at <= now
+            )
+            .order_by(OutboxMessage.next_attempt_at)
+            .limit(SEND_BATCH_SIZE)
+            .all()
+        )
+        db.session.commit()
+
+        sent = 0
+        for message_id, due_at in due:
+            # Claim by pushing next_attempt_at past the send timeout; another
+            # process polling the same database skips it, and a crash mid-send
+            # just means the message is retried once the lease runs out.
+            lease_until = now + timedelta(seconds=config["SMTP_TIMEOUT"] * 3)
+            claimed = db.session.execute(
+                update(OutboxMessage)
+                .where(
+                    OutboxMessage.id == message_id,
+                    OutboxMessage.status == "pending",
+                    OutboxMessage.next_attempt_at == due_at
+                )
+                .values(next_attempt_at=lease_until)
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                continue
+
+            message = db.session.get(OutboxMessage, message_id)
+            message.attempts += 1
+            try:
+                send_email(build_email(message, config["SMTP_FROM"]), config)
+            except (OSError, smtplib.SMTPException) as exc:
+                message.last_error = f"{type(exc).__name__}: {exc}"
+                if message.attempts >= config["OUTBOX_MAX_ATTEMPTS"]:
+                    message.status = "failed"
+                else:
+                    message.next_attempt_at = datetime.now() + retry_delay(
+                        message.attempts,
+                        config["OUTBOX_RETRY_BASE_SECONDS"],
+                        config["OUTBOX_RETRY_MAX_SECONDS"]
+                    )
+                self.app.logger.warning(
+                    "Outbox message %s to %s failed (attempt %s): %s",
+                    message.id, message.recipient, message.attempts, message.last_error
+                )
+            else:
+                message.status = "sent"
+                message.sent_at = datetime.now()
+                message.last_error = None
+                sent += 1
+            db.session.commit()
+        return sent
+
+
+def start_worker(app=None):
+    """Start this process's delivery thread unless SMTP_HOST is unset; server entry points call this."""
+    global _worker
+    app = app or current_app._get_current_object()
+    # Without an SMTP server messages wait in the outbox until one is configured.
+    if not app.config["SMTP_HOST"]:
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = OutboxWorker(app)
+    return _worker
+
+
+def restart_after_fork(app):
+    """Threads don't survive fork(); give a forked server worker its own delivery thread."""
+    global _worker
+    _worker = None
+    start_worker(app)
+
+
+def init_app(app):
+    app.config.setdefault("SMTP_HOST", os.getenv("SMTP_HOST"))
+    app.config.setdefault("SMTP_PORT", int(os.getenv("SMTP_PORT", "25")))
+    app.config.setdefault("SMTP_USERNAME", os.getenv("SMTP_USERNAME"))
+    app.config.setdefault("SMTP_PASSWORD", os.getenv("SMTP_PASSWORD"))
+    app.config.setdefault("SMTP_STARTTLS", os.getenv("SMTP_STARTTLS", "0") == "1")
+    app.config.setdefault("SMTP_SSL", os.getenv("SMTP_SSL", "0") == "1")
+    app.config.setdefault("SMTP_FROM", os.getenv("SMTP_FROM", "clock-in@localhost"))
+    app.config.setdefault("SMTP_TIMEOUT", float(os.getenv("SMTP_TIMEOUT", "10")))
+    app.config.setdefault("OUTBOX_POLL_SECONDS", float(os.getenv("OUTBOX_POLL_SECONDS", "30")))
+    app.config.setdefault("OUTBOX_MAX_ATTEMPTS", int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8")))
+    app.config.setdefault("OUTBOX_RETRY_BASE_SECONDS", float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30")))
+    app.config.setdefault("OUTBOX_RETRY_MAX_SECONDS", float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600")))
+    # Started by the servers (start_worker()), not here, so a preforking master
+    # never holds a live thread when it forks.
+
+
+class DebugSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept a message and print it."""
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self._reply("220 clock-in debug SMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("HELO", "EHLO"):
+                self._reply("250 clock-in debug SMTP")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line.rstrip(b"\r\n") == b".":
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                print(f"---------- message received {datetime.now():%H:%M:%S} ----------")
+                print(b"".join(lines).decode(errors="replace"), flush=True)
+                self._reply("250 OK: message accepted")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Debugging SMTP server that prints messages.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    with DebugSMTPServer((args.host, args.port), DebugSMTPHandler) as server:
+        print(f"Debug SMTP listening on {args.host}:{args.port}", flush=True)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+from typing import Tuple
+
+from sqlalchemy import Integer, cast, func
+
+PAY_PERIOD_LENGTH_DAYS = 14
+# Anchor bi-weekly periods so 12/22/2025-01/04/2026 is the first window and
+# 01/05/2026-01/18/2026 is the next.
+REFERENCE_PAY_PERIOD_START = date(2025, 12, 22)
+
+
+def get_pay_period_index(target_date: date) -> int:
+    """Return how many pay periods target_date falls after the reference period."""
+    return (target_date - REFERENCE_PAY_PERIOD_START).days // PAY_PERIOD_LENGTH_DAYS
+
+
+def get_pay_period_bounds_for_index(period_index: int) -> Tuple[date, date]:
+    start = REFERENCE_PAY_PERIOD_START + timedelta(days=period_index * PAY_PERIOD_LENGTH_DAYS)
+    end = start + timedelta(days=PAY_PERIOD_LENGTH_DAYS - 1)
+    return start, end
+
+
+def get_pay_period_bounds(target_date: date) -> Tuple[date, date]:
+    """Return the start and end dates (inclusive) for the bi-weekly period that contains target_date."""
+    return get_pay_period_bounds_for_index(get_pay_period_index(target_date))
+
+
+def is_pay_period_boundary(target_date: date) -> bool:
+    """True on the first or last day of a pay period, when payroll is being closed out."""
+    return target_date in get_pay_period_bounds(target_date)
+
+
+def pay_period_index_expr(column):
+    """SQL equivalent of get_pay_period_index for a datetime column (SQLite)."""
+    days = cast(
+        func.julianday(func.date(column)) - func.julianday(REFERENCE_PAY_PERIOD_START.isoformat()),
+        Integer
+    )
+    # SQLite integer division truncates toward zero; subtract the positive
+    # remainder first so dates before the anchor floor like Python's //.
+    length = PAY_PERIOD_LENGTH_DAYS
+    return (days - ((days % length) + length) % length) // length
+
+
+def shift_hours_expr(clock_in, clock_out):
+    """SQL expression for the length of a shift in hours (SQLite)."""
+    return (func.julianday(clock_out) - func.julianday(clock_in)) * 24
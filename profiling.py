@@ -0,0 +1,175 @@
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app, g, request, session
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_FLAG = "_profile"
+# Set by servers whose handlers can't be profiled per thread (see asgi.py).
+SKIP_PROFILE_ENVIRON_KEY = "clock_in.skip_profile"
+TOP_FUNCTION_COUNT = 25
+
+_request_counter = itertools.count(1)
+# From Python 3.12 a cProfile profiler is process-wide: enabling a second one
+# raises and the first records every thread. One request is profiled at a time.
+_profile_lock = threading.Lock()
+
+
+def _bucket(filename, function_name):
+    """Group a profiled function into the layer it belongs to."""
+    if "sqlite3" in function_name or "sqlite3" in filename:
+        return "database driver"
+    if "strftime" in function_name or "isoformat" in function_name:
+        return "date formatting"
+    if "jinja2" in filename or filename.endswith(".html"):
+        return "templates"
+    if os.sep + "sqlalchemy" + os.sep in filename:
+        return "SQLAlchemy / ORM"
+    if os.sep + "flask" + os.sep in filename or os.sep + "werkzeug" + os.sep in filename:
+        return "Flask / Werkzeug"
+    return "application"
+
+
+def _function_label(filename, line_number, function_name):
+    if filename == "~":
+        return function_name
+    return f"{os.path.basename(filename)}:{line_number}({function_name})"
+
+
+def _summarize(profiler):
+    stats = pstats.Stats(profiler)
+    entries = []
+    buckets = {}
+    for (filename, line_number, function_name), (
+        _primitive_calls, calls, self_seconds, cumulative_seconds, _callers
+    ) in stats.stats.items():
+        bucket = _bucket(filename, function_name)
+        buckets[bucket] = buckets.get(bucket, 0) + self_seconds * 1000
+        entries.append({
+            "function": _function_label(filename, line_number, function_name),
+            "bucket": bucket,
+            "calls": calls,
+            "self_ms": round(self_seconds * 1000, 3),
+            "cumulative_ms": round(cumulative_seconds * 1000, 3),
+        })
+    entries.sort(key=lambda entry: entry["self_ms"], reverse=True)
+    return entries[:TOP_FUNCTION_COUNT], {
+        bucket: round(milliseconds, 3)
+        for bucket, milliseconds in sorted(buckets.items(), key=lambda item: -item[1])
+    }
+
+
+def _profile_trigger():
+    if session.get("admin_authenticated") and (
+        request.headers.get(PROFILE_HEADER) == "1" or request.args.get(PROFILE_QUERY_FLAG) == "1"
+    ):
+        return "requested"
+    sample_rate = current_app.config["PROFILE_SAMPLE_RATE"]
+    if sample_rate and next(_request_counter) % sample_rate == 0:
+        return "sampled"
+    return None
+
+
+def _start_profile():
+    if request.endpoint in ("static", "asset") or request.environ.get(SKIP_PROFILE_ENVIRON_KEY):
+        return
+    trigger = _profile_trigger()
+    if not trigger or not _profile_lock.acquire(blocking=False):
+        return
+    profiler = cProfile.Profile()
+    g.profile = {"profiler": profiler, "trigger": trigger, "started": time.perf_counter()}
+    profiler.enable()
+
+
+def _finish_profile(response):
+    active = g.pop("profile", None)
+    if not active:
+        return response
+    profiler = active["profiler"]
+    profiler.disable()
+    _profile_lock.release()
+    duration_ms = (time.perf_counter() - active["started"]) * 1000
+
+    profile_dir = current_app.config["PROFILE_DIR"]
+    os.makedirs(profile_dir, exist_ok=True)
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    top_functions, buckets = _summarize(profiler)
+    summary = {
+        "id": profile_id,
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "trigger": active["trigger"],
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "duration_ms": round(duration_ms, 2),
+        "buckets": buckets,
+        "top_functions": top_functions,
+    }
+    profiler.dump_stats(os.path.join(profile_dir, f"{profile_id}.prof"))
+    with open(os.path.join(profile_dir, f"{profile_id}.json"), "w") as handle:
+        json.dump(summary, handle)
+    _prune(profile_dir, current_app.config["PROFILE_KEEP"])
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def _stop_profile(_exception):
+    # after_request is skipped when a view raises; teardown always runs.
+    active = g.pop("profile", None)
+    if active:
+        active["profiler"].disable()
+        _profile_lock.release()
+
+
+def _prune(profile_dir, keep):
+    summaries = sorted(name for name in os.listdir(profile_dir) if name.endswith(".json"))
+    for name in summaries[:-keep] if keep else []:
+        profile_id = name[:-len(".json")]
+        for extension in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(profile_dir, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def recent_profiles(limit=50):
+    """Return stored profile summaries, newest first (shared by every worker)."""
+    profile_dir = current_app.config["PROFILE_DIR"]
+    if not os.path.isdir(profile_dir):
+        return []
+    names = sorted((name for name in os.listdir(profile_dir) if name.endswith(".json")), reverse=True)
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(profile_dir, name)) as handle:
+                profiles.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(profile_id):
+    """Return the .prof file for profile_id, or None if it is unknown."""
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = os.path.join(current_app.config["PROFILE_DIR"], f"{profile_id}.prof")
+    return path if os.path.exists(path) else None
+
+
+def init_app(app):
+    app.config.setdefault("PROFILE_SAMPLE_RATE", int(os.getenv("PROFILE_SAMPLE_RATE", "0")))
+    app.config.setdefault(
+        "PROFILE_DIR", os.getenv("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+    )
+    app.config.setdefault("PROFILE_KEEP", int(os.getenv("PROFILE_KEEP", "50")))
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_stop_profile)
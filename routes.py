@@ -1,27 +1,47 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify
-from datetime import datetime, timedelta, date
+from flask import (
+    Blueprint, Response, abort, render_template, request, redirect, send_file, url_for, session,
+    jsonify, stream_with_context
+)
+from datetime import datetime, timedelta
+import csv
 import math
+import re
 from typing import Tuple
-from models import db, Employee, TimeRecord, EmployeeBonus, EmployeeHoursAdjustment
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
+from models import (
+    db, Employee, TimeRecord, EmployeeBonus, EmployeeHoursAdjustment, apply_clock_action, employee_field_error
+)
+from pay_periods import (
+    get_pay_period_bounds, get_pay_period_bounds_for_index, get_pay_period_index,
+    shift_hours_expr
+)
+import group_commit
+from live import hub, shift_event, start_feed, stream_events
+from export_formats import EXPORT_FORMATS, cached_export, format_export_line
+from fragments import bump_roster_version, roster_version
+from sites import ADMIN_SITE_SESSION_KEY, current_site, fan_out, select_kiosk_site, site_names
+from importer import IMPORTERS, upload_text_stream
+from journal import record_bulk
+from anomalies import ANOMALY_KINDS, MAX_REPORTED_ANOMALIES, close_stale, sweep
+import outbox
+from outbox import enqueue_email, recent_messages
+from profiling import profile_path, recent_profiles
 
 main_bp = Blueprint('main', __name__)
 
-PAY_PERIOD_LENGTH_DAYS = 14
-# Anchor bi-weekly periods so 12/22/2025-01/04/2026 is the first window and
-# 01/05/2026-01/18/2026 is the next.
-REFERENCE_PAY_PERIOD_START = date(2025, 12, 22)
 TEST_EMPLOYEE_CODE = "0430"
 TEST_EMPLOYEE_NAME = "Test Employee"
 ROUNDING_INCREMENT_HOURS = 0.5
-
-
-def get_pay_period_bounds(target_date: date) -> Tuple[date, date]:
-    """Return the start and end dates (inclusive) for the bi-weekly period that contains target_date."""
-    diff_days = (target_date - REFERENCE_PAY_PERIOD_START).days
-    period_index = diff_days // PAY_PERIOD_LENGTH_DAYS
-    start = REFERENCE_PAY_PERIOD_START + timedelta(days=period_index * PAY_PERIOD_LENGTH_DAYS)
-    end = start + timedelta(days=PAY_PERIOD_LENGTH_DAYS - 1)
-    return start, end
+MAX_TREND_PERIODS = 26
+EMPLOYEE_PAGE_SIZE = 50
+EMPLOYEE_SEARCH_LIMIT = 20
+# Rows per bulk rounding upsert. Each row binds a handful of parameters, and
+# SQLite before 3.32 allows 999 per statement (32766 after).
+ROUNDING_UPSERT_ROWS = 150
+ROUNDING_DIRECTIONS = {"up": "Round up", "down": "Round down", "nearest": "Round to nearest"}
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
 
 def _blank_admin_report():
@@ -42,17 +62,14 @@ def _blank_admin_report():
     }
 
 
-def _build_admin_report(form):
+def _admin_report_range(form):
+    """Parse the report form into a report dict plus the [start, end) datetimes to query."""
     report = _blank_admin_report()
     report["view_mode"] = form.get("view_mode", "custom")
     report["start_date_value"] = (form.get("start_date") or "").strip()
     report["end_date_value"] = (form.get("end_date") or "").strip()
     report["pay_period_date_value"] = (form.get("pay_period_date") or "").strip()
 
-    employee_id = form.get("employee_id")
-    if employee_id and employee_id != "all":
-        report["selected_employee"] = Employee.query.get(employee_id)
-
     range_start = None
     range_end = None
 
@@ -75,24 +92,67 @@ def _build_admin_report(form):
         else:
             report["error"] = "Select both start and end dates for a custom range."
 
+    return report, range_start, range_end
+
+
+def _admin_report_statement(range_start, range_end, employee):
+    statement = select(TimeRecord).filter(_clock_in_range(range_start, range_end))
+    if employee:
+        statement = statement.filter_by(employee_id=employee.id)
+    return statement.options(joinedload(TimeRecord.employee)).order_by(TimeRecord.clock_in)
+
+
+def _finish_admin_report(report, records):
+    report["records"] = records
+    report["total_hours"] = sum(
+        ((record.clock_out - record.clock_in).total_seconds() / 3600)
+        for record in records if record.clock_out
+    )
+    report["show_results"] = True
+    return report
+
+
+def _build_admin_report(form):
+    report, range_start, range_end = _admin_report_range(form)
+
+    employee_id = form.get("employee_id")
+    if employee_id and employee_id != "all":
+        report["selected_employee"] = Employee.query.get(employee_id)
+
     if range_start and range_end:
-        query = TimeRecord.query.filter(
-            TimeRecord.clock_in >= range_start,
-            TimeRecord.clock_in < range_end
-        )
-        if report["selected_employee"]:
-            query = query.filter_by(employee_id=report["selected_employee"].id)
+        records = db.session.scalars(
+            _admin_report_statement(range_start, range_end, report["selected_employee"])
+        ).all()
+        _finish_admin_report(report, records)
 
-        report["records"] = query.order_by(TimeRecord.clock_in).all()
-        report["total_hours"] = sum(
-            ((record.clock_out - record.clock_in).total_seconds() / 3600)
-            for record in report["records"] if record.clock_out
-        )
-        report["show_results"] = True
+    return report
 
+
+def _merge_site_reports(reports):
+    """Combine {site: report} into one report ordered by clock-in."""
+    report = dict(next(iter(reports.values())))
+    records = []
+    for site, site_report in reports.items():
+        for record in site_report["records"]:
+            record.site = site
+        records.extend(site_report["records"])
+    report["records"] = sorted(records, key=lambda record: record.clock_in)
+    report["total_hours"] = sum(site_report["total_hours"] for site_report in reports.values())
     return report
 
 
+def _reports_all_sites(form):
+    employee_id = form.get("employee_id")
+    return len(site_names()) > 1 and not (employee_id and employee_id != "all")
+
+
+def _build_site_report(form):
+    """Build the admin report for the current site, or across every site for all employees."""
+    if not _reports_all_sites(form):
+        return _build_admin_report(form)
+    return _merge_site_reports(fan_out(_build_admin_report, form))
+
+
 def _serialize_admin_report(report):
     period_label = None
     if report["view_mode"] == "pay_period" and report["pay_period_start"] and report["pay_period_end"]:
@@ -116,6 +176,7 @@ def _serialize_admin_report(report):
             )
 
         records.append({
+            "site": getattr(record, "site", None),
             "employee": record.employee.name,
             "clock_in": record.clock_in.strftime("%b %d, %Y %I:%M %p"),
             "clock_out": record.clock_out.strftime("%b %d, %Y %I:%M %p") if record.clock_out else None,
@@ -138,6 +199,72 @@ def _serialize_admin_report(report):
     }
 
 
+def _build_pay_period_trend(period_count, end_date):
+    last_index = get_pay_period_index(end_date)
+    first_index = last_index - period_count + 1
+    periods = [
+        {"index": index, "bounds": get_pay_period_bounds_for_index(index)}
+        for index in range(first_index, last_index + 1)
+    ]
+    range_start = datetime.combine(periods[0]["bounds"][0], datetime.min.time())
+    range_end = datetime.combine(periods[-1]["bounds"][1] + timedelta(days=1), datetime.min.time())
+
+    # One grouped query for the whole roster; the outer join keeps employees
+    # with no hours in the window. The join is per employee, so it keeps the
+    # clock_in range for ix_time_record_employee_clock_in and groups by the
+    # stored period.
+    rows = (
+        db.session.query(
+            Employee.id,
+            Employee.name,
+            TimeRecord.pay_period_index,
+            func.sum(shift_hours_expr(TimeRecord.clock_in, TimeRecord.clock_out))
+        )
+        .outerjoin(TimeRecord, and_(
+            TimeRecord.employee_id == Employee.id,
+            TimeRecord.clock_in >= range_start,
+            TimeRecord.clock_in < range_end,
+            TimeRecord.clock_out.isnot(None)
+        ))
+        .group_by(Employee.id, Employee.name, TimeRecord.pay_period_index)
+        .order_by(Employee.is_manager, Employee.name, Employee.id)
+        .all()
+    )
+
+    matrix = {}
+    for employee_id, name, index, hours in rows:
+        row = matrix.setdefault(employee_id, {
+            "employee_id": employee_id,
+            "name": name,
+            "hours": [0.0] * period_count,
+            "total_hours": 0.0,
+        })
+        if index is not None:
+            row["hours"][index - first_index] = hours or 0.0
+            row["total_hours"] += hours or 0.0
+
+    employee_rows = list(matrix.values())
+    for row in employee_rows:
+        row["site"] = current_site()
+    return {
+        "periods": periods,
+        "rows": employee_rows,
+        "period_totals": [
+            sum(row["hours"][column] for row in employee_rows) for column in range(period_count)
+        ],
+    }
+
+
+def _build_site_trend(period_count, end_date):
+    trends = fan_out(_build_pay_period_trend, period_count, end_date)
+    trend = dict(next(iter(trends.values())))
+    trend["rows"] = [row for site_trend in trends.values() for row in site_trend["rows"]]
+    trend["period_totals"] = [
+        sum(column) for column in zip(*(site_trend["period_totals"] for site_trend in trends.values()))
+    ]
+    return trend
+
+
 def _split_employee_name(name: str) -> Tuple[str, str]:
     parts = (name or "").strip().split()
     if not parts:
@@ -147,6 +274,44 @@ def _split_employee_name(name: str) -> Tuple[str, str]:
     return parts[0], " ".join(parts[1:])
 
 
+def _prefix_upper_bound(prefix: str) -> str:
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _search_employees(term, limit, offset=0):
+    """Return up to limit employees whose name or code starts with term, plus a has-more flag."""
+    query = Employee.query
+    term = (term or "").strip()
+    if term:
+        # Half-open ranges instead of LIKE so both branches are index range scans.
+        name_prefix = term.lower()
+        query = query.filter(or_(
+            and_(
+                func.lower(Employee.name) >= name_prefix,
+                func.lower(Employee.name) < _prefix_upper_bound(name_prefix)
+            ),
+            and_(
+                Employee.employee_code >= term,
+                Employee.employee_code < _prefix_upper_bound(term)
+            )
+        ))
+    employees = (
+        query.order_by(func.lower(Employee.name), Employee.id)
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+    return employees[:limit], len(employees) > limit
+
+
+def _parse_positive_int(value, default):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return default
+    return number if number > 0 else default
+
+
 def _format_export_name(name: str) -> str:
     first_name, last_name = _split_employee_name(name)
     if not first_name:
@@ -159,6 +324,57 @@ def _format_export_name(name: str) -> str:
     return first_name
 
 
+def _export_period_label(start_date, end_date):
+    return f"{start_date.strftime('%b %d, %Y')} - {end_date.strftime('%b %d, %Y')}"
+
+
+def _build_hours_export(start_date, end_date):
+    """Return (employees, ledger rows, text export) for the export page, email and downloads."""
+    employees = Employee.query.order_by(Employee.is_manager, Employee.name).all()
+    range_start = datetime.combine(start_date, datetime.min.time())
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+    totals = {}
+    for record in db.session.scalars(_range_records_statement(range_start, range_end)):
+        if record.clock_out:
+            totals[record.employee_id] = totals.get(record.employee_id, 0) + (
+                (record.clock_out - record.clock_in).total_seconds() / 3600
+            )
+
+    adjustments = db.session.scalars(_period_adjustments_statement(start_date, end_date))
+    adjustment_map = {adjustment.employee_id: adjustment for adjustment in adjustments}
+
+    bonuses = db.session.scalars(_period_bonuses_statement(start_date, end_date))
+    bonus_map = {bonus.employee_id: bonus for bonus in bonuses}
+
+    export_rows = []
+    export_lines = []
+    for employee in employees:
+        actual_hours = totals.get(employee.id, 0)
+        adjustment = adjustment_map.get(employee.id)
+        hours_base = adjustment.adjusted_hours if adjustment else actual_hours
+        rounded_hours = _round_hours_nearest(hours_base)
+        bonus = bonus_map.get(employee.id)
+        bonus_amount = bonus.amount if bonus else 0
+
+        first_name, last_name = _split_employee_name(employee.name)
+        row = {
+            "employee": employee,
+            "employee_code": employee.employee_code,
+            "first_name": first_name,
+            "last_name": last_name,
+            "display_name": _format_export_name(employee.name),
+            "is_manager": employee.is_manager,
+            "rounded_hours": rounded_hours,
+            "bonus_amount": bonus_amount,
+        }
+        row["line"] = format_export_line(row)
+        export_rows.append(row)
+        export_lines.append(row["line"])
+
+    return employees, export_rows, "\n".join(export_lines)
+
+
 def _admin_guard(ajax_payload=None):
     if session.get("admin_authenticated"):
         return None
@@ -246,6 +462,71 @@ def _get_hours_adjustment_for_period(employee_id, start_date, end_date):
     ).first()
 
 
+def _period_form_dates(form):
+    start_date = _parse_date_value(form.get("start_date") or "")
+    end_date = _parse_date_value(form.get("end_date") or "")
+    if not start_date or not end_date:
+        start_date, end_date = _default_pay_period_range()
+    return start_date, end_date
+
+
+def _total_row(actual_hours, adjustment, bonus):
+    """One employee's figures on the total hours view."""
+    adjusted_hours = adjustment.adjusted_hours if adjustment else actual_hours
+    return {
+        "actual_hours": actual_hours,
+        "adjusted_hours": adjusted_hours,
+        "adjusted_hours_value": f"{adjusted_hours:.2f}",
+        "show_actual": adjustment is not None and abs(adjusted_hours - actual_hours) > 0.005,
+        "bonus_amount": f"{bonus.amount:.2f}" if bonus else "",
+    }
+
+
+def _employee_total_row(employee_id, start_date, end_date):
+    range_start = datetime.combine(start_date, datetime.min.time())
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    row = _total_row(
+        _closed_hours_between(employee_id, range_start, range_end),
+        _get_hours_adjustment_for_period(employee_id, start_date, end_date),
+        _get_bonus_for_period(employee_id, start_date, end_date)
+    )
+    row["employee_id"] = employee_id
+    return row
+
+
+def _shift_row(record, start_date, end_date):
+    return {
+        "id": record.id,
+        "clock_in": record.clock_in.strftime("%Y-%m-%dT%H:%M"),
+        "clock_out": record.clock_out.strftime("%Y-%m-%dT%H:%M") if record.clock_out else "",
+        "hours": (
+            round((record.clock_out - record.clock_in).total_seconds() / 3600, 2)
+            if record.clock_out else None
+        ),
+        "in_period": start_date <= record.clock_in.date() <= end_date,
+    }
+
+
+def _hours_response(message, params, error=False, row=None, before=None, **extra):
+    """Redirect back to the hours page, or answer an XHR save with only the changed row.
+
+    overall_delta is how far the save moved the all-employee total, so the page
+    patches one row instead of recomputing every employee.
+    """
+    if request.headers.get("X-Requested-With") != "XMLHttpRequest":
+        return redirect(url_for(
+            "main.admin_hours_bonuses",
+            status="error" if error else "success",
+            message=message,
+            **params
+        ))
+    payload = {"success": not error, "message": message, **extra}
+    if row:
+        payload["row"] = row
+        payload["overall_delta"] = round(row["adjusted_hours"] - before["adjusted_hours"], 4)
+    return jsonify(payload)
+
+
 def _round_hours(hours, direction):
     increment = ROUNDING_INCREMENT_HOURS
     if increment <= 0:
@@ -268,12 +549,235 @@ def _round_hours_nearest(hours):
     return round(rounded_units * increment, 2)
 
 
+def _rounded_hours(hours, direction):
+    if direction == "nearest":
+        return _round_hours_nearest(hours)
+    return _round_hours(hours, direction)
+
+
+def _bulk_rounding_plan(start_date, end_date, direction):
+    """Return the adjustment rounding would make for every employee whose hours change.
+
+    Totals come from one grouped query and existing adjustments from one more,
+    so the cost doesn't grow with round trips per employee.
+    """
+    range_start = datetime.combine(start_date, datetime.min.time())
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    totals = dict(db.session.execute(_range_totals_statement(range_start, range_end)).all())
+    adjustments = {
+        adjustment.employee_id: adjustment.adjusted_hours
+        for adjustment in db.session.scalars(_period_adjustments_statement(start_date, end_date))
+    }
+
+    plan = []
+    for employee in Employee.query.order_by(Employee.is_manager, Employee.name).all():
+        # julianday arithmetic leaves noise like 7.9999999 that would round the wrong way.
+        actual_hours = round(totals.get(employee.id) or 0, 6)
+        current_hours = adjustments.get(employee.id, actual_hours)
+        rounded_hours = _rounded_hours(actual_hours, direction)
+        if abs(rounded_hours - current_hours) < 0.005:
+            continue
+        plan.append({
+            "employee": employee,
+            "actual_hours": actual_hours,
+            "current_hours": current_hours,
+            "rounded_hours": rounded_hours,
+            "delta": round(rounded_hours - current_hours, 2),
+        })
+    return plan
+
+
+def _apply_bulk_rounding(plan, start_date, end_date):
+    """Upsert every planned adjustment with INSERT ... ON CONFLICT, ROUNDING_UPSERT_ROWS rows per statement.
+
+    The chunks share one transaction, so the roster is rounded all or nothing.
+    """
+    if not plan:
+        return
+    for chunk_start in range(0, len(plan), ROUNDING_UPSERT_ROWS):
+        statement = sqlite_insert(EmployeeHoursAdjustment).values([
+            {
+                "employee_id": entry["employee"].id,
+                "period_start": start_date,
+                "period_end": end_date,
+                "adjusted_hours": entry["rounded_hours"],
+            }
+            for entry in plan[chunk_start:chunk_start + ROUNDING_UPSERT_ROWS]
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=["employee_id", "period_start", "period_end"],
+            set_={"adjusted_hours": statement.excluded.adjusted_hours}
+        )
+        db.session.execute(statement)
+    # A Core statement skips the session's flush events, so journal it here.
+    record_bulk("adjustment", start_date, end_date, operation="update")
+    db.session.commit()
+
+
+def _clock_in_range(range_start, range_end):
+    """Filter for clock-ins in [range_start, range_end).
+
+    Exactly one pay period compares the stored pay_period_index, an equality
+    lookup on ix_time_record_pay_period; any other range compares clock_in.
+    """
+    period_index = get_pay_period_index(range_start.date())
+    period_start, period_end = get_pay_period_bounds_for_index(period_index)
+    if (
+        range_start == datetime.combine(period_start, datetime.min.time())
+        and range_end == datetime.combine(period_end + timedelta(days=1), datetime.min.time())
+    ):
+        return TimeRecord.pay_period_index == period_index
+    return and_(TimeRecord.clock_in >= range_start, TimeRecord.clock_in < range_end)
+
+
+def _active_record_statement(employee_id):
+    return (
+        select(TimeRecord).filter_by(employee_id=employee_id, clock_out=None)
+        .order_by(TimeRecord.clock_in.desc())
+        .limit(1)
+    )
+
+
+def _period_records_statement(employee_id, range_start, range_end):
+    return (
+        select(TimeRecord).filter(
+            TimeRecord.employee_id == employee_id,
+            _clock_in_range(range_start, range_end)
+        )
+        .order_by(TimeRecord.clock_in.desc())
+    )
+
+
+def _closed_shifts_statement(employee_id, range_start, range_end):
+    return select(TimeRecord.clock_in, TimeRecord.clock_out).filter(
+        TimeRecord.employee_id == employee_id,
+        _clock_in_range(range_start, range_end),
+        TimeRecord.clock_out.isnot(None)
+    )
+
+
+def _employee_by_code_statement(code):
+    return select(Employee).filter_by(employee_code=code).limit(1)
+
+
+def _range_records_statement(range_start, range_end):
+    return select(TimeRecord).filter(_clock_in_range(range_start, range_end))
+
+
+def _range_totals_statement(range_start, range_end):
+    return (
+        select(
+            TimeRecord.employee_id,
+            func.sum(shift_hours_expr(TimeRecord.clock_in, TimeRecord.clock_out))
+        )
+        .filter(_clock_in_range(range_start, range_end), TimeRecord.clock_out.isnot(None))
+        .group_by(TimeRecord.employee_id)
+    )
+
+
+def _period_bonuses_statement(start_date, end_date):
+    return select(EmployeeBonus).filter_by(period_start=start_date, period_end=end_date)
+
+
+def _period_adjustments_statement(start_date, end_date):
+    return select(EmployeeHoursAdjustment).filter_by(period_start=start_date, period_end=end_date)
+
+
+def _sum_shift_hours(rows):
+    return sum((clock_out - clock_in).total_seconds() / 3600 for clock_in, clock_out in rows)
+
+
+def _get_active_record(employee_id):
+    return db.session.scalars(_active_record_statement(employee_id)).first()
+
+
+def _closed_hours_between(employee_id, range_start, range_end):
+    return _sum_shift_hours(
+        db.session.execute(_closed_shifts_statement(employee_id, range_start, range_end))
+    )
+
+
+def _open_shift_events():
+    open_records = (
+        TimeRecord.query.options(joinedload(TimeRecord.employee))
+        .filter(TimeRecord.clock_out.is_(None))
+        .order_by(TimeRecord.clock_in)
+        .all()
+    )
+    return [shift_event(record, "open") for record in open_records]
+
+
+def _live_board_snapshot():
+    # Each site is read in its own short-lived app context, so the long-lived
+    # stream never holds a read transaction while idle.
+    shifts = [
+        shift for site_shifts in fan_out(_open_shift_events).values() for shift in site_shifts
+    ]
+    return {
+        "server_time": datetime.now().isoformat(),
+        "shifts": sorted(shifts, key=lambda shift: shift["clock_in"]),
+    }
+
+
+def _clock_period_range(today):
+    pay_period_start, pay_period_end = get_pay_period_bounds(today)
+    period_start_dt = datetime.combine(pay_period_start, datetime.min.time())
+    period_end_dt = datetime.combine(pay_period_end + timedelta(days=1), datetime.min.time())
+    return pay_period_start, pay_period_end, period_start_dt, period_end_dt
+
+
+def _render_clock(employee, records, active_record, now, error):
+    pay_period_start, pay_period_end = get_pay_period_bounds(now.date())
+    total_biweekly_hours = sum(
+        ((record.clock_out - record.clock_in).total_seconds() / 3600)
+        for record in records
+        if record.clock_out
+    )
+    current_shift_hours = (
+        (now - active_record.clock_in).total_seconds() / 3600 if active_record else 0
+    )
+
+    return render_template(
+        "clock.html",
+        employee=employee,
+        records=records,
+        pay_period_start=pay_period_start,
+        pay_period_end=pay_period_end,
+        can_clock_in=active_record is None,
+        can_clock_out=active_record is not None,
+        current_shift_hours=current_shift_hours,
+        total_biweekly_hours=total_biweekly_hours,
+        active_record=active_record,
+        now=now,
+        error=error
+    )
+
+
+def _clock_status_response(active_record, period_total_hours, pay_period_start, pay_period_end):
+    payload = {
+        "active_clock_in": active_record.clock_in.isoformat() if active_record else None,
+        "can_clock_in": active_record is None,
+        "can_clock_out": active_record is not None,
+        "period_total_hours": round(period_total_hours, 4),
+        "pay_period_start": pay_period_start.isoformat(),
+        "pay_period_end": pay_period_end.isoformat(),
+    }
+
+    # The payload only changes on a punch or an admin edit, so pollers mostly get a 304.
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 def ensure_test_employee():
     """Guarantee that the hard-coded testing employee exists."""
     employee = Employee.query.filter_by(employee_code=TEST_EMPLOYEE_CODE).first()
     if not employee:
         employee = Employee(name=TEST_EMPLOYEE_NAME, employee_code=TEST_EMPLOYEE_CODE)
         db.session.add(employee)
+        bump_roster_version()
         db.session.commit()
     return employee
 
@@ -287,8 +791,13 @@ def home():
 def login():
     error = None
     if request.method == "POST":
+        site = (request.form.get("site") or current_site()).strip()
+        if site not in site_names():
+            return render_template("login.html", error="Select a valid location.")
+        select_kiosk_site(site)
+
         code = (request.form.get("employee_code") or "").strip()
-        employee = Employee.query.filter_by(employee_code=code).first()
+        employee = db.session.scalars(_employee_by_code_statement(code)).first()
 
         if code == TEST_EMPLOYEE_CODE and not employee:
             employee = ensure_test_employee()
@@ -313,72 +822,47 @@ def clock():
         session.pop("employee_id", None)
         return redirect(url_for("main.login"))
 
-    today = datetime.now().date()
-    pay_period_start, pay_period_end = get_pay_period_bounds(today)
-    period_start_dt = datetime.combine(pay_period_start, datetime.min.time())
-    period_end_dt = datetime.combine(pay_period_end + timedelta(days=1), datetime.min.time())
-
     now = datetime.now()
-    active_record = (
-        TimeRecord.query.filter_by(employee_id=employee.id, clock_out=None)
-        .order_by(TimeRecord.clock_in.desc())
-        .first()
-    )
-    can_clock_in = active_record is None
-    can_clock_out = active_record is not None
+    _, _, period_start_dt, period_end_dt = _clock_period_range(now.date())
+    active_record = _get_active_record(employee.id)
 
     error = None
     if request.method == "POST":
         action = request.form.get("action")
-        if action == "in":
-            if can_clock_in:
-                new_record = TimeRecord(employee_id=employee.id, clock_in=now)
-                db.session.add(new_record)
-                db.session.commit()
-                return redirect(url_for("main.clock"))
-            else:
-                error = "You already have an active shift."
-        elif action == "out":
-            if can_clock_out:
-                active_record.clock_out = now
-                db.session.commit()
-                return redirect(url_for("main.clock"))
-            else:
-                error = "No active shift to clock out of."
+        if group_commit.is_enabled() and action in ("in", "out"):
+            # Hand the pooled connection back while waiting; the writer needs one
+            # and applies apply_clock_action inside its own transaction.
+            db.session.rollback()
+            error, _result = group_commit.submit_clock_event(employee_id, action, now)
         else:
-            error = "Invalid action."
+            error, record = apply_clock_action(action, employee.id, active_record, now)
+            if not error:
+                db.session.add(record)
+                db.session.commit()
+        if not error:
+            return redirect(url_for("main.clock"))
 
-    records = (
-        TimeRecord.query.filter(
-            TimeRecord.employee_id == employee.id,
-            TimeRecord.clock_in >= period_start_dt,
-            TimeRecord.clock_in < period_end_dt
-        )
-        .order_by(TimeRecord.clock_in.desc())
-        .all()
-    )
+    records = db.session.scalars(
+        _period_records_statement(employee.id, period_start_dt, period_end_dt)
+    ).all()
+    return _render_clock(employee, records, active_record, now, error)
 
-    total_biweekly_hours = sum(
-        ((record.clock_out - record.clock_in).total_seconds() / 3600)
-        for record in records
-        if record.clock_out
-    )
-    current_shift_hours = (
-        (now - active_record.clock_in).total_seconds() / 3600 if active_record else 0
-    )
 
-    return render_template(
-        "clock.html",
-        employee=employee,
-        records=records,
-        pay_period_start=pay_period_start,
-        pay_period_end=pay_period_end,
-        can_clock_in=can_clock_in,
-        can_clock_out=can_clock_out,
-        current_shift_hours=current_shift_hours,
-        total_biweekly_hours=total_biweekly_hours,
-        active_record=active_record,
-        error=error
+@main_bp.route("/clock/status", methods=["GET"])
+def clock_status():
+    employee_id = session.get("employee_id")
+    if not employee_id:
+        return jsonify({"error": "Employee login required."}), 401
+
+    pay_period_start, pay_period_end, period_start_dt, period_end_dt = _clock_period_range(
+        datetime.now().date()
+    )
+    active_record = _get_active_record(employee_id)
+    return _clock_status_response(
+        active_record,
+        _closed_hours_between(employee_id, period_start_dt, period_end_dt),
+        pay_period_start,
+        pay_period_end
     )
 
 
@@ -388,15 +872,13 @@ def admin():
     if guard:
         return guard
 
-    employees = Employee.query.all()
     report = _blank_admin_report()
 
     if request.method == "POST":
-        report = _build_admin_report(request.form)
+        report = _build_site_report(request.form)
 
     return render_template(
         "admin.html",
-        employees=employees,
         records=report["records"],
         total_hours=report["total_hours"],
         selected_employee=report["selected_employee"],
@@ -420,14 +902,52 @@ def admin_report():
     if guard:
         return guard
 
-    report = _build_admin_report(request.form)
+    report = _build_site_report(request.form)
     return jsonify(_serialize_admin_report(report))
 
 
-@main_bp.route("/admin/login", methods=["GET", "POST"])
-def admin_login():
-    if session.get("admin_authenticated"):
-        return redirect(url_for("main.admin"))
+@main_bp.route("/admin/live", methods=["GET"])
+def admin_live_board():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    return render_template("admin_live.html", active_nav="live")
+
+
+@main_bp.route("/admin/live/stream", methods=["GET"])
+def admin_live_stream():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    # Start the feed and subscribe before the snapshot so nothing committed in
+    # between is missed.
+    start_feed()
+    subscriber = hub.subscribe()
+    return Response(
+        stream_with_context(stream_events(subscriber, hub, _live_board_snapshot)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@main_bp.route("/admin/site", methods=["POST"])
+def admin_select_site():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    site = (request.form.get("site") or "").strip()
+    if site in site_names():
+        session[ADMIN_SITE_SESSION_KEY] = site
+    return redirect(request.referrer or url_for("main.admin"))
+
+
+@main_bp.route("/admin/login", methods=["GET", "POST"])
+def admin_login():
+    if session.get("admin_authenticated"):
+        return redirect(url_for("main.admin"))
 
     error = None
     if request.method == "POST":
@@ -455,19 +975,11 @@ def admin_add_employee():
     employee_code = (request.form.get("employee_code") or "").strip()
     is_manager = (request.form.get("is_manager") or "").strip() == "1"
 
-    if not first_name or not last_name or not employee_code:
-        payload = {
-            "success": False,
-            "message": "First name, last name, and employee code are required."
-        }
-        return jsonify(payload) if is_ajax else redirect(
-            url_for("main.admin_add_employee_page", status="error", message=payload["message"])
-        )
-
-    if len(employee_code) != 4:
+    field_error = employee_field_error(first_name, last_name, employee_code)
+    if field_error:
         payload = {
             "success": False,
-            "message": "Employee code must be exactly 4 characters."
+            "message": field_error
         }
         return jsonify(payload) if is_ajax else redirect(
             url_for("main.admin_add_employee_page", status="error", message=payload["message"])
@@ -490,6 +1002,7 @@ def admin_add_employee():
         is_manager=is_manager
     )
     db.session.add(new_employee)
+    bump_roster_version()
     db.session.commit()
 
     payload = {
@@ -522,6 +1035,42 @@ def admin_add_employee_page():
     )
 
 
+@main_bp.route("/admin/import", methods=["GET", "POST"])
+def admin_import():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    kind = (request.form.get("kind") or "employees").strip()
+    result = None
+    error = None
+    if request.method == "POST":
+        upload = request.files.get("csv_file")
+        importer = IMPORTERS.get(kind)
+        if not importer:
+            error = "Select what to import."
+        elif not upload or not upload.filename:
+            error = "Choose a CSV file to import."
+        else:
+            # Read the upload as a stream; large files are spooled to disk, not memory.
+            text_stream = upload_text_stream(upload)
+            try:
+                result = importer(text_stream)
+            except (UnicodeDecodeError, csv.Error) as exc:
+                db.session.rollback()
+                error = f"Could not read the CSV file: {exc}"
+            if result and result["error"]:
+                error = result["error"]
+
+    return render_template(
+        "admin_import.html",
+        active_nav="import",
+        kind=kind,
+        result=result,
+        error=error
+    )
+
+
 @main_bp.route("/admin/manage-employees", methods=["GET"])
 def admin_manage_employees():
     guard = _admin_guard()
@@ -530,7 +1079,11 @@ def admin_manage_employees():
 
     status_message = request.args.get("message")
     status_type = request.args.get("status")
-    employees = Employee.query.order_by(Employee.name).all()
+    search_term = (request.args.get("q") or "").strip()
+    page = _parse_positive_int(request.args.get("page"), 1)
+    employees, has_more = _search_employees(
+        search_term, EMPLOYEE_PAGE_SIZE, (page - 1) * EMPLOYEE_PAGE_SIZE
+    )
     employee_rows = []
     for employee in employees:
         first_name, last_name = _split_employee_name(employee.name)
@@ -544,19 +1097,50 @@ def admin_manage_employees():
     return render_template(
         "admin_manage_employees.html",
         employees=employee_rows,
+        search_term=search_term,
+        page=page,
+        has_previous=page > 1,
+        has_next=has_more,
         status_message=status_message,
         status_type=status_type,
         active_nav="manage"
     )
 
 
+@main_bp.route("/admin/employees/search", methods=["GET"])
+def admin_search_employees():
+    guard = _admin_guard({"error": "Admin login required.", "results": []})
+    if guard:
+        return guard
+
+    limit = min(_parse_positive_int(request.args.get("limit"), EMPLOYEE_SEARCH_LIMIT), EMPLOYEE_PAGE_SIZE)
+    offset = _parse_positive_int(request.args.get("offset"), 0)
+    employees, has_more = _search_employees(request.args.get("q"), limit, offset)
+    response = jsonify({
+        "results": [
+            {
+                "id": employee.id,
+                "name": employee.name,
+                "code": employee.employee_code,
+                "label": f"{employee.name} ({employee.employee_code})",
+            }
+            for employee in employees
+        ],
+        "has_more": has_more,
+        "roster_version": roster_version(),
+    })
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @main_bp.route("/admin/hours-bonuses", methods=["GET"])
 def admin_hours_bonuses():
     guard = _admin_guard()
     if guard:
         return guard
 
-    employees = Employee.query.order_by(Employee.is_manager, Employee.name).all()
     view_mode = (request.args.get("view_mode") or "total").strip()
     if view_mode not in ("shift", "total"):
         view_mode = "total"
@@ -575,7 +1159,6 @@ def admin_hours_bonuses():
 
     data = {
         "view_mode": view_mode,
-        "employees": employees,
         "selected_employee": None,
         "records": [],
         "total_hours": 0,
@@ -600,15 +1183,9 @@ def admin_hours_bonuses():
         if not data["selected_employee"]:
             data["error"] = "Select an employee to view shift details."
         else:
-            data["records"] = (
-                TimeRecord.query.filter(
-                    TimeRecord.employee_id == data["selected_employee"].id,
-                    TimeRecord.clock_in >= range_start,
-                    TimeRecord.clock_in < range_end
-                )
-                .order_by(TimeRecord.clock_in.desc())
-                .all()
-            )
+            data["records"] = db.session.scalars(
+                _period_records_statement(data["selected_employee"].id, range_start, range_end)
+            ).all()
             data["total_hours"] = sum(
                 ((record.clock_out - record.clock_in).total_seconds() / 3600)
                 for record in data["records"] if record.clock_out
@@ -616,42 +1193,29 @@ def admin_hours_bonuses():
             bonus = _get_bonus_for_period(data["selected_employee"].id, start_date, end_date)
             data["bonus_amount"] = f"{bonus.amount:.2f}" if bonus else ""
     else:
+        employees = Employee.query.order_by(Employee.is_manager, Employee.name).all()
         totals = {}
-        for record in TimeRecord.query.filter(
-            TimeRecord.clock_in >= range_start,
-            TimeRecord.clock_in < range_end
-        ).all():
+        for record in db.session.scalars(_range_records_statement(range_start, range_end)):
             if record.clock_out:
                 totals[record.employee_id] = totals.get(record.employee_id, 0) + (
                     (record.clock_out - record.clock_in).total_seconds() / 3600
                 )
 
-        bonuses = EmployeeBonus.query.filter_by(
-            period_start=start_date,
-            period_end=end_date
-        ).all()
+        bonuses = db.session.scalars(_period_bonuses_statement(start_date, end_date))
         bonus_map = {bonus.employee_id: bonus for bonus in bonuses}
 
-        adjustments = EmployeeHoursAdjustment.query.filter_by(
-            period_start=start_date,
-            period_end=end_date
-        ).all()
+        adjustments = db.session.scalars(_period_adjustments_statement(start_date, end_date))
         adjustment_map = {adjustment.employee_id: adjustment for adjustment in adjustments}
 
         for employee in employees:
-            actual_hours = totals.get(employee.id, 0)
-            adjustment = adjustment_map.get(employee.id)
-            adjusted_hours = adjustment.adjusted_hours if adjustment else actual_hours
-            bonus = bonus_map.get(employee.id)
-            data["total_rows"].append({
-                "employee": employee,
-                "actual_hours": actual_hours,
-                "adjusted_hours": adjusted_hours,
-                "adjusted_hours_value": f"{adjusted_hours:.2f}",
-                "show_actual": adjustment is not None and abs(adjusted_hours - actual_hours) > 0.005,
-                "bonus_amount": f"{bonus.amount:.2f}" if bonus else "",
-            })
-            data["overall_hours"] += adjusted_hours
+            row = _total_row(
+                totals.get(employee.id, 0),
+                adjustment_map.get(employee.id),
+                bonus_map.get(employee.id)
+            )
+            row["employee"] = employee
+            data["total_rows"].append(row)
+            data["overall_hours"] += row["adjusted_hours"]
 
     return render_template("admin_hours_bonuses.html", active_nav="hours", **data)
 
@@ -662,13 +1226,12 @@ def admin_export_hours():
     if guard:
         return guard
 
-    employees = Employee.query.order_by(Employee.is_manager, Employee.name).all()
     start_value = request.args.get("start_date")
     end_value = request.args.get("end_date")
     email = (request.args.get("email") or "").strip()
 
     start_date, end_date, start_value, end_value, range_error = _resolve_date_range(start_value, end_value)
-    period_label = f"{start_date.strftime('%b %d, %Y')} - {end_date.strftime('%b %d, %Y')}"
+    period_label = _export_period_label(start_date, end_date)
 
     status_message = request.args.get("message")
     status_type = request.args.get("status")
@@ -676,55 +1239,7 @@ def admin_export_hours():
         status_message = range_error
         status_type = "error"
 
-    range_start = datetime.combine(start_date, datetime.min.time())
-    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
-
-    totals = {}
-    for record in TimeRecord.query.filter(
-        TimeRecord.clock_in >= range_start,
-        TimeRecord.clock_in < range_end
-    ).all():
-        if record.clock_out:
-            totals[record.employee_id] = totals.get(record.employee_id, 0) + (
-                (record.clock_out - record.clock_in).total_seconds() / 3600
-            )
-
-    adjustments = EmployeeHoursAdjustment.query.filter_by(
-        period_start=start_date,
-        period_end=end_date
-    ).all()
-    adjustment_map = {adjustment.employee_id: adjustment for adjustment in adjustments}
-
-    bonuses = EmployeeBonus.query.filter_by(
-        period_start=start_date,
-        period_end=end_date
-    ).all()
-    bonus_map = {bonus.employee_id: bonus for bonus in bonuses}
-
-    export_rows = []
-    export_lines = []
-    for employee in employees:
-        actual_hours = totals.get(employee.id, 0)
-        adjustment = adjustment_map.get(employee.id)
-        hours_base = adjustment.adjusted_hours if adjustment else actual_hours
-        rounded_hours = _round_hours_nearest(hours_base)
-        bonus = bonus_map.get(employee.id)
-        bonus_amount = bonus.amount if bonus else 0
-
-        display_name = _format_export_name(employee.name)
-        salary_suffix = " (Salary)" if employee.is_manager else ""
-        bonus_text = f", Bonus, ${bonus_amount:.0f}" if bonus_amount > 0 else ""
-        line = f"{display_name}, {rounded_hours:.1f}{bonus_text}{salary_suffix}"
-        export_rows.append({
-            "employee": employee,
-            "display_name": display_name,
-            "rounded_hours": rounded_hours,
-            "bonus_amount": bonus_amount,
-            "line": line,
-        })
-        export_lines.append(line)
-
-    export_body = "\n".join(export_lines)
+    employees, export_rows, export_body = _build_hours_export(start_date, end_date)
 
     return render_template(
         "admin_export_hours.html",
@@ -733,6 +1248,7 @@ def admin_export_hours():
         export_rows=export_rows,
         export_body=export_body,
         email=email,
+        outbox_messages=recent_messages(),
         period_label=period_label,
         start_date_value=start_value,
         end_date_value=end_value,
@@ -741,9 +1257,194 @@ def admin_export_hours():
     )
 
 
+@main_bp.route("/admin/export-hours/download", methods=["GET"])
+def admin_download_export():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    format_name = request.args.get("format") or "text"
+    start_date, end_date, start_value, end_value, range_error = _resolve_date_range(
+        request.args.get("start_date"), request.args.get("end_date")
+    )
+    params = {"start_date": start_value, "end_date": end_value}
+    if range_error:
+        return redirect(url_for("main.admin_export_hours", status="error", message=range_error, **params))
+    export_format = EXPORT_FORMATS.get(format_name)
+    if not export_format:
+        return redirect(url_for(
+            "main.admin_export_hours", status="error", message="Select a valid export format.", **params
+        ))
+
+    export_file = cached_export(
+        format_name, start_date, end_date, lambda: _build_hours_export(start_date, end_date)[1]
+    )
+    return send_file(
+        export_file,
+        mimetype=export_format.mimetype,
+        as_attachment=True,
+        download_name=f"hours-{start_value}-to-{end_value}.{export_format.extension}",
+        max_age=0
+    )
+
+
+@main_bp.route("/admin/export-hours/email", methods=["POST"])
+def admin_email_export():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    email = (request.form.get("email") or "").strip()
+    start_date, end_date, start_value, end_value, range_error = _resolve_date_range(
+        request.form.get("start_date"), request.form.get("end_date")
+    )
+    params = {"email": email, "start_date": start_value, "end_date": end_value}
+    if range_error:
+        return redirect(url_for(
+            "main.admin_export_hours", status="error", message=range_error, **params
+        ))
+    if not EMAIL_PATTERN.match(email):
+        return redirect(url_for(
+            "main.admin_export_hours", status="error", message="Enter a valid email address.", **params
+        ))
+
+    _, _, export_body = _build_hours_export(start_date, end_date)
+    period_label = _export_period_label(start_date, end_date)
+    enqueue_email(
+        email,
+        f"Hours Export: {period_label}",
+        f"Hours for {period_label}\n\n{export_body}\n",
+        attachment_name=f"hours-{start_value}-to-{end_value}.txt",
+        attachment_body=export_body + "\n"
+    )
+    db.session.commit()
+    outbox.notify()
+    return redirect(url_for(
+        "main.admin_export_hours",
+        status="success",
+        message=f"Export queued for delivery to {email}.",
+        **params
+    ))
+
+
+@main_bp.route("/admin/trends", methods=["GET"])
+def admin_pay_period_trends():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    try:
+        period_count = int(request.args.get("periods") or 6)
+    except ValueError:
+        period_count = 6
+    period_count = max(1, min(period_count, MAX_TREND_PERIODS))
+
+    end_date = _parse_date_value((request.args.get("end_date") or "").strip())
+    if not end_date:
+        end_date = datetime.now().date()
+
+    trend = _build_site_trend(period_count, end_date)
+    return render_template(
+        "admin_trends.html",
+        active_nav="trends",
+        period_count=period_count,
+        max_periods=MAX_TREND_PERIODS,
+        end_date_value=end_date.strftime("%Y-%m-%d"),
+        **trend
+    )
+
+
+def _anomaly_rows(anomalies):
+    rows = []
+    for anomaly in anomalies:
+        record = anomaly["record"]
+        if record is None:
+            continue
+        start_date, end_date = get_pay_period_bounds(record.clock_in.date())
+        hours = anomaly["hours"]
+        if hours is None:
+            hours = ((record.clock_out or datetime.now()) - record.clock_in).total_seconds() / 3600
+        rows.append({
+            "kind": anomaly["kind"],
+            "label": ANOMALY_KINDS[anomaly["kind"]],
+            "record": record,
+            "other_record": anomaly["other_record"],
+            "next_record": anomaly["next_record"],
+            "hours": hours,
+            "shift_url": url_for(
+                "main.admin_hours_bonuses",
+                view_mode="shift",
+                employee_id=record.employee_id,
+                start_date=start_date.strftime("%Y-%m-%d"),
+                end_date=end_date.strftime("%Y-%m-%d")
+            ),
+        })
+    return rows
+
+
+@main_bp.route("/admin/anomalies", methods=["GET"])
+def admin_anomalies():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    result = sweep()
+    return render_template(
+        "admin_anomalies.html",
+        active_nav="anomalies",
+        result=result,
+        rows=_anomaly_rows(result["anomalies"]),
+        kinds=ANOMALY_KINDS,
+        max_reported=MAX_REPORTED_ANOMALIES,
+        status_message=request.args.get("message"),
+        status_type=request.args.get("status")
+    )
+
+
+@main_bp.route("/admin/anomalies/close-stale", methods=["POST"])
+def admin_close_stale_shifts():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    closed = close_stale(sweep())
+    count = len(closed)
+    return redirect(url_for(
+        "main.admin_anomalies",
+        status="success",
+        message=f"Clocked out {count} forgotten shift{'' if count == 1 else 's'}."
+    ))
+
+
+@main_bp.route("/admin/profiles", methods=["GET"])
+def admin_profiles():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    return render_template(
+        "admin_profiles.html",
+        active_nav="profiles",
+        profiles=recent_profiles(),
+        selected_id=request.args.get("id")
+    )
+
+
+@main_bp.route("/admin/profiles/<profile_id>.prof", methods=["GET"])
+def admin_download_profile(profile_id):
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    path = profile_path(profile_id)
+    if not path:
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=f"{profile_id}.prof")
+
+
 @main_bp.route("/admin/hours-bonuses/shift", methods=["POST"])
 def admin_update_shift():
-    guard = _admin_guard()
+    guard = _admin_guard({"success": False, "message": "Admin login required."})
     if guard:
         return guard
 
@@ -751,12 +1452,7 @@ def admin_update_shift():
     record_id = request.form.get("record_id")
     record = TimeRecord.query.get(record_id) if record_id else None
     if not record:
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Shift not found.",
-            **params
-        ))
+        return _hours_response("Shift not found.", params, error=True)
 
     clock_in_value = (request.form.get("clock_in") or "").strip()
     clock_out_value = (request.form.get("clock_out") or "").strip()
@@ -764,49 +1460,32 @@ def admin_update_shift():
     clock_out = _parse_datetime_local(clock_out_value) if clock_out_value else None
 
     if clock_in_value and not clock_in:
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Enter a valid clock-in time.",
-            **params
-        ))
+        return _hours_response("Enter a valid clock-in time.", params, error=True)
     if clock_out_value and not clock_out:
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Enter a valid clock-out time.",
-            **params
-        ))
+        return _hours_response("Enter a valid clock-out time.", params, error=True)
     if not clock_in:
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Clock-in time is required.",
-            **params
-        ))
+        return _hours_response("Clock-in time is required.", params, error=True)
     if clock_out and clock_out < clock_in:
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Clock-out must be after clock-in.",
-            **params
-        ))
+        return _hours_response("Clock-out must be after clock-in.", params, error=True)
 
+    start_date, end_date = _period_form_dates(request.form)
+    before = _employee_total_row(record.employee_id, start_date, end_date)
     record.clock_in = clock_in
     record.clock_out = clock_out
     db.session.commit()
 
-    return redirect(url_for(
-        "main.admin_hours_bonuses",
-        status="success",
-        message="Shift updated.",
-        **params
-    ))
+    return _hours_response(
+        "Shift updated.",
+        params,
+        row=_employee_total_row(record.employee_id, start_date, end_date),
+        before=before,
+        record=_shift_row(record, start_date, end_date)
+    )
 
 
 @main_bp.route("/admin/hours-bonuses/bonus", methods=["POST"])
 def admin_update_bonus():
-    guard = _admin_guard()
+    guard = _admin_guard({"success": False, "message": "Admin login required."})
     if guard:
         return guard
 
@@ -814,36 +1493,19 @@ def admin_update_bonus():
     employee_id = (request.form.get("employee_id") or "").strip()
     employee = Employee.query.get(employee_id) if employee_id else None
     if not employee:
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Employee not found.",
-            **params
-        ))
+        return _hours_response("Employee not found.", params, error=True)
 
-    start_date = _parse_date_value(request.form.get("start_date") or "")
-    end_date = _parse_date_value(request.form.get("end_date") or "")
-    if not start_date or not end_date:
-        start_date, end_date = _default_pay_period_range()
+    start_date, end_date = _period_form_dates(request.form)
+    before = _employee_total_row(employee.id, start_date, end_date)
 
     amount_value = (request.form.get("bonus_amount") or "").strip()
     if amount_value:
         try:
             amount = float(amount_value)
         except ValueError:
-            return redirect(url_for(
-                "main.admin_hours_bonuses",
-                status="error",
-                message="Bonus amount must be a number.",
-                **params
-            ))
+            return _hours_response("Bonus amount must be a number.", params, error=True)
         if amount < 0:
-            return redirect(url_for(
-                "main.admin_hours_bonuses",
-                status="error",
-                message="Bonus amount cannot be negative.",
-                **params
-            ))
+            return _hours_response("Bonus amount cannot be negative.", params, error=True)
 
         bonus = _get_bonus_for_period(employee.id, start_date, end_date)
         if not bonus:
@@ -863,17 +1525,14 @@ def admin_update_bonus():
             db.session.commit()
         message = "Bonus cleared."
 
-    return redirect(url_for(
-        "main.admin_hours_bonuses",
-        status="success",
-        message=message,
-        **params
-    ))
+    return _hours_response(
+        message, params, row=_employee_total_row(employee.id, start_date, end_date), before=before
+    )
 
 
 @main_bp.route("/admin/hours-bonuses/round", methods=["POST"])
 def admin_round_hours():
-    guard = _admin_guard()
+    guard = _admin_guard({"success": False, "message": "Admin login required."})
     if guard:
         return guard
 
@@ -881,41 +1540,16 @@ def admin_round_hours():
     employee_id = (request.form.get("employee_id") or "").strip()
     employee = Employee.query.get(employee_id) if employee_id else None
     if not employee:
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Employee not found.",
-            **params
-        ))
+        return _hours_response("Employee not found.", params, error=True)
 
     direction = (request.form.get("direction") or "").strip().lower()
     if direction not in ("up", "down"):
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Select a valid rounding option.",
-            **params
-        ))
+        return _hours_response("Select a valid rounding option.", params, error=True)
 
-    start_date = _parse_date_value(request.form.get("start_date") or "")
-    end_date = _parse_date_value(request.form.get("end_date") or "")
-    if not start_date or not end_date:
-        start_date, end_date = _default_pay_period_range()
+    start_date, end_date = _period_form_dates(request.form)
+    before = _employee_total_row(employee.id, start_date, end_date)
 
-    range_start = datetime.combine(start_date, datetime.min.time())
-    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
-
-    total_hours = sum(
-        ((record.clock_out - record.clock_in).total_seconds() / 3600)
-        for record in TimeRecord.query.filter(
-            TimeRecord.employee_id == employee.id,
-            TimeRecord.clock_in >= range_start,
-            TimeRecord.clock_in < range_end
-        ).all()
-        if record.clock_out
-    )
-
-    rounded_hours = _round_hours(total_hours, direction)
+    rounded_hours = _round_hours(before["actual_hours"], direction)
     adjustment = _get_hours_adjustment_for_period(employee.id, start_date, end_date)
     if not adjustment:
         adjustment = EmployeeHoursAdjustment(
@@ -928,17 +1562,14 @@ def admin_round_hours():
     db.session.commit()
 
     message = "Hours rounded up." if direction == "up" else "Hours rounded down."
-    return redirect(url_for(
-        "main.admin_hours_bonuses",
-        status="success",
-        message=message,
-        **params
-    ))
+    return _hours_response(
+        message, params, row=_employee_total_row(employee.id, start_date, end_date), before=before
+    )
 
 
 @main_bp.route("/admin/hours-bonuses/adjust", methods=["POST"])
 def admin_adjust_hours():
-    guard = _admin_guard()
+    guard = _admin_guard({"success": False, "message": "Admin login required."})
     if guard:
         return guard
 
@@ -946,36 +1577,19 @@ def admin_adjust_hours():
     employee_id = (request.form.get("employee_id") or "").strip()
     employee = Employee.query.get(employee_id) if employee_id else None
     if not employee:
-        return redirect(url_for(
-            "main.admin_hours_bonuses",
-            status="error",
-            message="Employee not found.",
-            **params
-        ))
+        return _hours_response("Employee not found.", params, error=True)
 
-    start_date = _parse_date_value(request.form.get("start_date") or "")
-    end_date = _parse_date_value(request.form.get("end_date") or "")
-    if not start_date or not end_date:
-        start_date, end_date = _default_pay_period_range()
+    start_date, end_date = _period_form_dates(request.form)
+    before = _employee_total_row(employee.id, start_date, end_date)
 
     adjusted_value = (request.form.get("adjusted_hours") or "").strip()
     if adjusted_value:
         try:
             adjusted_hours = float(adjusted_value)
         except ValueError:
-            return redirect(url_for(
-                "main.admin_hours_bonuses",
-                status="error",
-                message="Hours must be a number.",
-                **params
-            ))
+            return _hours_response("Hours must be a number.", params, error=True)
         if adjusted_hours < 0:
-            return redirect(url_for(
-                "main.admin_hours_bonuses",
-                status="error",
-                message="Hours cannot be negative.",
-                **params
-            ))
+            return _hours_response("Hours cannot be negative.", params, error=True)
 
         adjustment = _get_hours_adjustment_for_period(employee.id, start_date, end_date)
         if not adjustment:
@@ -995,12 +1609,44 @@ def admin_adjust_hours():
             db.session.commit()
         message = "Hours reset to actual."
 
-    return redirect(url_for(
-        "main.admin_hours_bonuses",
-        status="success",
-        message=message,
-        **params
-    ))
+    return _hours_response(
+        message, params, row=_employee_total_row(employee.id, start_date, end_date), before=before
+    )
+
+
+@main_bp.route("/admin/hours-bonuses/round-all", methods=["GET", "POST"])
+def admin_round_all():
+    guard = _admin_guard()
+    if guard:
+        return guard
+
+    form = request.form if request.method == "POST" else request.args
+    params = _hours_return_params(form)
+    direction = (form.get("direction") or "").strip().lower()
+    if direction not in ROUNDING_DIRECTIONS:
+        return _hours_response("Select a valid rounding option.", params, error=True)
+
+    start_date, end_date = _period_form_dates(form)
+    plan = _bulk_rounding_plan(start_date, end_date, direction)
+    if request.method == "POST":
+        _apply_bulk_rounding(plan, start_date, end_date)
+        count = len(plan)
+        return _hours_response(
+            f"Rounded hours for {count} employee{'' if count == 1 else 's'}.", params
+        )
+
+    return render_template(
+        "admin_round_all.html",
+        active_nav="hours",
+        plan=plan,
+        direction=direction,
+        direction_label=ROUNDING_DIRECTIONS[direction],
+        rounding_increment=ROUNDING_INCREMENT_HOURS,
+        total_delta=sum(entry["delta"] for entry in plan),
+        period_label=f"{start_date.strftime('%b %d, %Y')} - {end_date.strftime('%b %d, %Y')}",
+        start_date_value=start_date.strftime("%Y-%m-%d"),
+        end_date_value=end_date.strftime("%Y-%m-%d")
+    )
 
 
 @main_bp.route("/admin/hours-bonuses/adjust-bulk", methods=["POST"])
@@ -1141,18 +1787,12 @@ def admin_update_employee():
     if not employee:
         return redirect(url_for("main.admin_manage_employees", status="error", message="Employee not found."))
 
-    if not first_name or not last_name or not employee_code:
-        return redirect(url_for(
-            "main.admin_manage_employees",
-            status="error",
-            message="First name, last name, and employee code are required."
-        ))
-
-    if len(employee_code) != 4:
+    field_error = employee_field_error(first_name, last_name, employee_code)
+    if field_error:
         return redirect(url_for(
             "main.admin_manage_employees",
             status="error",
-            message="Employee code must be exactly 4 characters."
+            message=field_error
         ))
 
     existing_employee = Employee.query.filter(
@@ -1168,6 +1808,7 @@ def admin_update_employee():
 
     employee.name = " ".join(part for part in [first_name, last_name] if part)
     employee.employee_code = employee_code
+    bump_roster_version()
     db.session.commit()
     return redirect(url_for("main.admin_manage_employees", status="success", message="Employee updated."))
 
@@ -1195,6 +1836,7 @@ def admin_delete_employee():
         ))
 
     db.session.delete(employee)
+    bump_roster_version()
     db.session.commit()
     return redirect(url_for("main.admin_manage_employees", status="success", message="Employee removed."))
 
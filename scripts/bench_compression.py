@@ -0,0 +1,106 @@
+"""Compare payload sizes and latency of admin endpoints with and without compression.
+
+Seeds a throwaway SQLite database, then requests each endpoint through the
+Flask test client with each Accept-Encoding. Latency is server time plus the
+time the body would take over a link of --link-kbps.
+
+    python scripts/bench_compression.py --employees 80 --link-kbps 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+
+def _seed(db, employees, shifts_per_employee):
+    from models import Employee, TimeRecord
+    from routes import get_pay_period_bounds
+
+    period_start, _period_end = get_pay_period_bounds(datetime.now().date())
+    for index in range(employees):
+        employee = Employee(name=f"Employee{index} Lastname{index}", employee_code=f"{index:04d}")
+        db.session.add(employee)
+        db.session.flush()
+        for day in range(shifts_per_employee):
+            clock_in = datetime.combine(period_start, datetime.min.time()) + timedelta(
+                days=day % 14, hours=8, minutes=index % 45
+            )
+            db.session.add(TimeRecord(
+                employee_id=employee.id,
+                clock_in=clock_in,
+                clock_out=clock_in + timedelta(hours=7, minutes=(index * 7) % 60)
+            ))
+    db.session.commit()
+
+
+def _measure(client, method, path, data, encoding, runs):
+    headers = {"Accept-Encoding": encoding} if encoding else {"Accept-Encoding": "identity"}
+    timings = []
+    size = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data, headers=headers)
+        body = response.get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+        size = len(body)
+    return size, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=80)
+    parser.add_argument("--shifts", type=int, default=10, help="shifts per employee")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--link-kbps", type=float, default=2000, help="simulated link speed")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+    os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(workdir, "jinja_cache")
+
+    from app import create_app
+    from extensions import db
+    from migrations import upgrade
+
+    app = create_app()
+    with app.app_context():
+        upgrade()
+        _seed(db, args.employees, args.shifts)
+
+    client = app.test_client()
+    client.post("/admin/login", data={"username": "admin", "password": "admin123"})
+
+    today = datetime.now().date().isoformat()
+    endpoints = [
+        ("POST", "/admin/report", {"view_mode": "pay_period", "pay_period_date": today, "employee_id": "all"}),
+        ("GET", "/admin/export-hours", None),
+        ("GET", "/admin/hours-bonuses", None),
+    ]
+    encodings = [None, "gzip"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        pass
+
+    bytes_per_ms = args.link_kbps * 1000 / 8 / 1000
+    print(f"{args.employees} employees x {args.shifts} shifts, link {args.link_kbps:g} kbit/s, "
+          f"median of {args.runs}")
+    print(f"{'endpoint':<24}{'encoding':<10}{'bytes':>10}{'ratio':>8}{'server ms':>11}{'total ms':>10}")
+    for method, path, data in endpoints:
+        baseline = None
+        for encoding in encodings:
+            size, server_ms = _measure(client, method, path, data, encoding, args.runs)
+            baseline = baseline or size
+            total_ms = server_ms + size / bytes_per_ms
+            print(f"{path:<24}{encoding or 'identity':<10}{size:>10}{size / baseline:>8.2f}"
+                  f"{server_ms:>11.1f}{total_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Shift-change load test against a running instance.
+
+Simulates a whole shift punching at once: each virtual employee logs in,
+checks /clock/status, posts a clock in/out and loads /clock, while admin
+threads keep hitting /admin/report and the hours export. Prints p50/p95/p99
+latency per endpoint, errors (5xx responses, and logins or punches that don't
+redirect) and throughput, and saves the run as JSON so configurations can be
+compared. The server log has the tracebacks behind any 5xx.
+
+    python app.py                                   # in another terminal
+    python scripts/loadtest.py --employees 300 --label baseline
+    python scripts/loadtest.py --compare loadtest-results/a.json loadtest-results/b.json
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+FIRST_EMPLOYEE_CODE = 5000
+# Employee codes are four digits, so the virtual roster is 5000-9999.
+MAX_EMPLOYEES = 10000 - FIRST_EMPLOYEE_CODE
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin123"
+
+
+class Client:
+    """One virtual user: a keep-alive connection with its own session cookie."""
+
+    def __init__(self, base_url, recorder, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.recorder = recorder
+        self.cookie = None
+        self.connection = None
+
+    def _connect(self):
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, name, method, path, form=None, body=None, headers=None, expect=None):
+        """Send one request and record it; a 5xx or a status other than expect counts as an error."""
+        headers = dict(headers or {})
+        if form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+
+        started = time.perf_counter()
+        status = None
+        error = None
+        payload = b""
+        try:
+            if not self.connection:
+                self._connect()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            status = response.status
+            set_cookie = response.getheader("Set-Cookie")
+            if set_cookie:
+                self.cookie = set_cookie.split(";", 1)[0]
+            if status >= 500 or (expect and status != expect):
+                error = f"http {status}"
+        except (OSError, http.client.HTTPException) as exc:
+            error = type(exc).__name__
+            self.connection = None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.recorder.record(name, elapsed_ms, status, error)
+        return status, payload
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, elapsed_ms, status, error):
+        with self._lock:
+            self.samples[name].append(elapsed_ms)
+            if error:
+                self.errors[name][error] += 1
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _employee_code(index):
+    return f"{FIRST_EMPLOYEE_CODE + index:04d}"
+
+
+def _seed_employees(base_url, count, timeout):
+    client = Client(base_url, Recorder(), timeout)
+    client.request("setup", "POST", "/admin/login",
+                   form={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    rows = ["first_name,last_name,employee_code"]
+    rows += [f"Load,Tester{index},{_employee_code(index)}" for index in range(count)]
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"kind\"\r\n\r\nemployees\r\n".encode())
+    body.write(
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"csv_file\"; filename=\"load.csv\"\r\n"
+        f"Content-Type: text/csv\r\n\r\n".encode()
+    )
+    body.write("\n".join(rows).encode())
+    body.write(f"\r\n--{boundary}--\r\n".encode())
+    # Codes that already exist from earlier runs are rejected, which is fine.
+    client.request("setup", "POST", "/admin/import", body=body.getvalue(),
+                   headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+
+def _check_logins(base_url, count, timeout):
+    """Exit before the run if the first or last virtual employee can't log in."""
+    for code in {_employee_code(0), _employee_code(count - 1)}:
+        status, _payload = Client(base_url, Recorder(), timeout).request(
+            "setup", "POST", "/clock/login", form={"employee_code": code}
+        )
+        if status != 302:
+            sys.exit(f"Employee {code} can't log in (HTTP {status}); seed the roster or drop --skip-seed.")
+
+
+def _employee_worker(base_url, code, args, recorder, start_at):
+    client = Client(base_url, recorder, args.timeout)
+    time.sleep(max(0, start_at - time.time()))
+    for _round in range(args.rounds):
+        status, _payload = client.request("login", "POST", "/clock/login", form={"employee_code": code}, expect=302)
+        if status != 302:
+            # Everything after a failed login would just bounce back to it.
+            return
+        status, payload = client.request("clock_status", "GET", "/clock/status")
+        action = "in"
+        if status == 200:
+            try:
+                action = "in" if json.loads(payload)["can_clock_in"] else "out"
+            except (ValueError, KeyError):
+                pass
+        client.request("clock_post", "POST", "/clock", form={"action": action}, expect=302)
+        client.request("clock_get", "GET", "/clock")
+        time.sleep(random.uniform(0, args.think_seconds))
+
+
+def _admin_worker(base_url, args, recorder, stop):
+    client = Client(base_url, recorder, args.timeout)
+    client.request("admin_login", "POST", "/admin/login",
+                   form={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    today = datetime.now().date().isoformat()
+    while not stop.is_set():
+        client.request("admin_report", "POST", "/admin/report",
+                       form={"view_mode": "pay_period", "pay_period_date": today, "employee_id": "all"},
+                       headers={"X-Requested-With": "XMLHttpRequest"})
+        client.request("admin_export", "GET", "/admin/export-hours")
+        stop.wait(args.admin_think_seconds)
+
+
+def run(args):
+    if not args.skip_seed:
+        _seed_employees(args.base_url, args.employees, args.timeout)
+    _check_logins(args.base_url, args.employees, args.timeout)
+
+    recorder = Recorder()
+    stop = threading.Event()
+    admins = [
+        threading.Thread(target=_admin_worker, args=(args.base_url, args, recorder, stop), daemon=True)
+        for _ in range(args.admins)
+    ]
+    started = time.time()
+    employees = [
+        threading.Thread(
+            target=_employee_worker,
+            args=(args.base_url, _employee_code(index), args, recorder,
+                  started + random.uniform(0, args.ramp_seconds)),
+            daemon=True
+        )
+        for index in range(args.employees)
+    ]
+    for thread in admins + employees:
+        thread.start()
+    for thread in employees:
+        thread.join()
+    stop.set()
+    for thread in admins:
+        thread.join()
+    duration = time.time() - started
+
+    endpoints = {}
+    for name, samples in sorted(recorder.samples.items()):
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": dict(recorder.errors[name]),
+            "p50_ms": _percentile(samples, 50),
+            "p95_ms": _percentile(samples, 95),
+            "p99_ms": _percentile(samples, 99),
+            "mean_ms": statistics.fmean(samples),
+        }
+    total_requests = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "label": args.label,
+        "started_at": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "config": {
+            "base_url": args.base_url,
+            "employees": args.employees,
+            "admins": args.admins,
+            "rounds": args.rounds,
+            "ramp_seconds": args.ramp_seconds,
+        },
+        "duration_seconds": duration,
+        "throughput_rps": total_requests / duration if duration else 0,
+        "total_requests": total_requests,
+        "total_errors": sum(sum(endpoint["errors"].values()) for endpoint in endpoints.values()),
+        "endpoints": endpoints,
+    }
+
+
+def _format_ms(value):
+    return f"{value:8.1f}" if value is not None else "       -"
+
+
+def print_summary(result):
+    print(f"{result['label'] or 'run'}: {result['total_requests']} requests in "
+          f"{result['duration_seconds']:.1f}s, {result['throughput_rps']:.1f} req/s, "
+          f"{result['total_errors']} errors")
+    print(f"{'endpoint':<14}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  errors")
+    for name, endpoint in result["endpoints"].items():
+        errors = ", ".join(f"{kind}: {count}" for kind, count in endpoint["errors"].items()) or "-"
+        print(f"{name:<14}{endpoint['requests']:>9}{_format_ms(endpoint['p50_ms'])}"
+              f"{_format_ms(endpoint['p95_ms'])}{_format_ms(endpoint['p99_ms'])}  {errors}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as handle:
+        before = json.load(handle)
+    with open(after_path) as handle:
+        after = json.load(handle)
+    print(f"{'endpoint':<14}{'p95 before':>11}{'p95 after':>11}{'change':>9}{'errors':>12}")
+    for name in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        old = before["endpoints"].get(name, {})
+        new = after["endpoints"].get(name, {})
+        old_p95, new_p95 = old.get("p95_ms"), new.get("p95_ms")
+        change = f"{(new_p95 / old_p95 - 1) * 100:+.0f}%" if old_p95 and new_p95 else "-"
+        errors = f"{sum(old.get('errors', {}).values())} -> {sum(new.get('errors', {}).values())}"
+        print(f"{name:<14}{_format_ms(old_p95):>11}{_format_ms(new_p95):>11}{change:>9}{errors:>12}")
+    print(f"throughput: {before['throughput_rps']:.1f} -> {after['throughput_rps']:.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--employees", type=int, default=200,
+                        help=f"concurrent virtual employees (at most {MAX_EMPLOYEES})")
+    parser.add_argument("--admins", type=int, default=2, help="concurrent admin report/export loops")
+    parser.add_argument("--rounds", type=int, default=2, help="punches per employee")
+    parser.add_argument("--ramp-seconds", type=float, default=10, help="spread of employee start times")
+    parser.add_argument("--think-seconds", type=float, default=2)
+    parser.add_argument("--admin-think-seconds", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--skip-seed", action="store_true", help="employees already exist")
+    parser.add_argument("--label", default="", help="name stored with the results")
+    parser.add_argument("--output-dir", default="loadtest-results")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not 1 <= args.employees <= MAX_EMPLOYEES:
+        parser.error(f"--employees must be between 1 and {MAX_EMPLOYEES}")
+
+    result = run(args)
+    print_summary(result)
+    os.makedirs(args.output_dir, exist_ok=True)
+    filename = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if args.label:
+        filename += f"-{args.label}"
+    path = os.path.join(args.output_dir, f"{filename}.json")
+    with open(path, "w") as handle:
+        json.dump(result, handle, indent=2)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, request, session
+
+DEFAULT_SITE_NAME = "main"
+# The kiosk and the admin pages remember their location separately, so an admin
+# switching location never moves an employee signed in on the same browser.
+KIOSK_SITE_SESSION_KEY = "kiosk_site"
+ADMIN_SITE_SESSION_KEY = "admin_site"
+MAX_FAN_OUT_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=MAX_FAN_OUT_WORKERS, thread_name_prefix="site-fan-out")
+
+
+def parse_site_databases(value):
+    """Parse ``name=url,name=url`` into an ordered {site: database URL} dict."""
+    databases = {}
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, separator, url = entry.partition("=")
+        if not separator or not name.strip() or not url.strip():
+            raise ValueError(f"Invalid SITE_DATABASES entry: {entry!r}")
+        databases[name.strip()] = url.strip()
+    return databases
+
+
+def site_names():
+    return current_app.config["SITES"]
+
+
+def current_site():
+    return g.get("site") or current_app.config["DEFAULT_SITE"]
+
+
+def use_site(site):
+    """Point db.session at site's database for the rest of this app context."""
+    g.site = site
+    g.site_bind_key = None if site == current_app.config["DEFAULT_SITE"] else site
+
+
+def site_engines():
+    """Return {site: engine} for every configured site."""
+    from extensions import db
+
+    default_site = current_app.config["DEFAULT_SITE"]
+    return {
+        site: db.engines[None if site == default_site else site]
+        for site in site_names()
+    }
+
+
+def fan_out(fn, *args, sites=None):
+    """Run fn(*args) once per site in parallel and return {site: result}.
+
+    Each call gets its own app context and session, so ORM objects it returns
+    are detached; load any relationships the caller needs eagerly.
+    """
+    app = current_app._get_current_object()
+    sites = list(sites or site_names())
+
+    def run(site):
+        with app.app_context():
+            use_site(site)
+            return fn(*args)
+
+    if len(sites) == 1:
+        return {sites[0]: run(sites[0])}
+    futures = {site: _executor.submit(run, site) for site in sites}
+    return {site: future.result() for site, future in futures.items()}
+
+
+def site_session_key():
+    """Session key holding the location for this request: admin pages or the kiosk."""
+    return ADMIN_SITE_SESSION_KEY if request.path.startswith("/admin") else KIOSK_SITE_SESSION_KEY
+
+
+def select_kiosk_site(site):
+    """Point the kiosk at site, signing out an employee who signed in at another location."""
+    if session.get(KIOSK_SITE_SESSION_KEY) != site:
+        session.pop("employee_id", None)
+    session[KIOSK_SITE_SESSION_KEY] = site
+    use_site(site)
+
+
+def _select_request_site():
+    site = session.get(site_session_key())
+    if site not in site_names():
+        site = current_app.config["DEFAULT_SITE"]
+    use_site(site)
+
+
+def _inject_sites():
+    return {"sites": site_names(), "current_site": current_site()}
+
+
+def init_app(app):
+    """Register every site as a database bind; call before db.init_app."""
+    default_site = os.getenv("SITE_NAME") or DEFAULT_SITE_NAME
+    extra_sites = parse_site_databases(os.getenv("SITE_DATABASES"))
+    extra_sites.pop(default_site, None)
+    app.config["DEFAULT_SITE"] = default_site
+    app.config["SITES"] = [default_site, *extra_sites]
+    app.config["SQLALCHEMY_BINDS"] = {**app.config.get("SQLALCHEMY_BINDS", {}), **extra_sites}
+    app.before_request(_select_request_site)
+    app.context_processor(_inject_sites)
@@ -0,0 +1,72 @@
+(function () {
+    function debounce(fn, waitMs) {
+        let timer = null;
+        return function () {
+            const args = arguments;
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                fn.apply(null, args);
+            }, waitMs);
+        };
+    }
+
+    function setupTypeahead(input) {
+        const hidden = document.getElementById(input.dataset.target);
+        const list = document.getElementById(input.getAttribute("list"));
+        const searchUrl = input.dataset.searchUrl;
+        const emptyValue = input.dataset.emptyValue || "";
+        const labels = new Map();
+
+        if (!hidden || !list || !searchUrl || !window.fetch) {
+            return;
+        }
+
+        // The employee the page was rendered with is a match before any search.
+        if (input.value.trim() && hidden.value && hidden.value !== emptyValue) {
+            labels.set(input.value.trim(), hidden.value);
+        }
+
+        function syncSelection() {
+            const value = input.value.trim();
+            if (!value) {
+                hidden.value = emptyValue;
+                input.setCustomValidity("");
+            } else if (labels.has(value)) {
+                hidden.value = labels.get(value);
+                input.setCustomValidity("");
+            } else {
+                // Text that names nobody must not submit the last employee picked.
+                hidden.value = "";
+                input.setCustomValidity("Pick an employee from the list.");
+            }
+        }
+
+        const search = debounce(function (term) {
+            const url = searchUrl + "?limit=20&q=" + encodeURIComponent(term);
+            fetch(url, {
+                credentials: "same-origin",
+                headers: { "X-Requested-With": "XMLHttpRequest" }
+            })
+                .then((response) => (response.ok ? response.json() : { results: [] }))
+                .then((data) => {
+                    list.innerHTML = "";
+                    data.results.forEach((employee) => {
+                        labels.set(employee.label, String(employee.id));
+                        const option = document.createElement("option");
+                        option.value = employee.label;
+                        list.appendChild(option);
+                    });
+                    syncSelection();
+                })
+                .catch(() => {});
+        }, 150);
+
+        input.addEventListener("input", function () {
+            syncSelection();
+            search(input.value.trim());
+        });
+        input.addEventListener("change", syncSelection);
+    }
+
+    document.querySelectorAll("input[data-typeahead]").forEach(setupTypeahead);
+})();
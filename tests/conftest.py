@@ -0,0 +1,52 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+# The app's modules live at the repository root rather than in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@contextmanager
+def _migrated_app(db_dir, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{db_dir / 'clock.db'}")
+    monkeypatch.setenv("TEMPLATE_CACHE_DIR", str(db_dir / "jinja_cache"))
+    monkeypatch.setenv("EXPORT_CACHE_DIR", str(db_dir / "export_cache"))
+    monkeypatch.delenv("SITE_DATABASES", raising=False)
+
+    from app import create_app
+    from migrations import upgrade_all
+
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        upgrade_all()
+    yield app
+    with app.app_context():
+        from extensions import db
+
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The Flask app on a throwaway, migrated SQLite database with one location."""
+    with _migrated_app(tmp_path, monkeypatch) as app:
+        yield app
+
+
+@pytest.fixture(scope="module")
+def module_app(tmp_path_factory):
+    """Like app, but shared by every test in a module, for tests that only read what they seed."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        with _migrated_app(tmp_path_factory.mktemp("db"), monkeypatch) as app:
+            yield app
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    client.post("/admin/login", data={"username": "admin", "password": "admin123"})
+    return client
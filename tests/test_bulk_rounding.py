@@ -0,0 +1,61 @@
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, insert
+
+from extensions import db
+from models import ChangeJournal, Employee, EmployeeHoursAdjustment, TimeRecord
+
+# SQLite before 3.32 caps a statement at 999 bound parameters.
+OLD_SQLITE_VARIABLE_LIMIT = 999
+EMPLOYEES = 400
+
+
+@pytest.fixture
+def old_sqlite_limits(app):
+    """Hold every new connection to the parameter limit of SQLite before 3.32."""
+    if not hasattr(sqlite3.Connection, "setlimit"):
+        pytest.skip("Connection.setlimit needs Python 3.11")
+
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, OLD_SQLITE_VARIABLE_LIMIT)
+
+    with app.app_context():
+        engine = db.engine
+        engine.dispose()
+        event.listen(engine, "connect", connect)
+    yield
+    event.remove(engine, "connect", connect)
+
+
+def test_round_all_upserts_a_large_roster_in_chunks(app, admin_client, old_sqlite_limits):
+    with app.app_context():
+        db.session.execute(insert(Employee), [
+            {"name": f"Employee{index} Lastname", "employee_code": f"{index:04d}"}
+            for index in range(1, EMPLOYEES + 1)
+        ])
+        employee_ids = db.session.scalars(db.select(Employee.id)).all()
+        db.session.execute(insert(TimeRecord), [
+            {
+                "employee_id": employee_id,
+                "clock_in": datetime(2026, 1, 6, 8, 0),
+                "clock_out": datetime(2026, 1, 6, 15, 47),
+            }
+            for employee_id in employee_ids
+        ])
+        db.session.commit()
+        last_seq = db.session.query(db.func.max(ChangeJournal.seq)).scalar() or 0
+
+    response = admin_client.post(
+        "/admin/hours-bonuses/round-all",
+        data={"start_date": "2026-01-05", "end_date": "2026-01-18", "direction": "up"},
+    )
+
+    assert response.status_code == 302
+    assert f"Rounded+hours+for+{len(employee_ids)}+employees" in response.location
+    with app.app_context():
+        assert {adjustment.adjusted_hours for adjustment in EmployeeHoursAdjustment.query} == {8.0}
+        assert EmployeeHoursAdjustment.query.count() == len(employee_ids)
+        journal = ChangeJournal.query.filter(ChangeJournal.seq > last_seq).all()
+        assert [(entry.entity, entry.range_start) for entry in journal] == [("adjustment", date(2026, 1, 5))]
@@ -0,0 +1,41 @@
+import io
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Employee, TimeRecord
+
+SPOOL_THRESHOLD_BYTES = 500 * 1024
+
+
+def _time_records_csv(employee_code, shifts):
+    start = datetime(2026, 1, 5, 8, 0)
+    lines = ["employee_code,clock_in,clock_out"]
+    for day in range(shifts):
+        clock_in = start + timedelta(days=day)
+        lines.append(f"{employee_code},{clock_in:%Y-%m-%d %H:%M},{clock_in + timedelta(hours=8):%Y-%m-%d %H:%M}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.mark.parametrize("spooled_file_readable", [True, False], ids=["python-3.11+", "python-3.10"])
+def test_import_of_upload_spooled_to_disk(app, admin_client, monkeypatch, spooled_file_readable):
+    if not spooled_file_readable:
+        # SpooledTemporaryFile only gained readable() in Python 3.11.
+        monkeypatch.delattr(tempfile.SpooledTemporaryFile, "readable", raising=False)
+    with app.app_context():
+        db.session.add(Employee(name="Ada Lovelace", employee_code="1815"))
+        db.session.commit()
+    body = _time_records_csv("1815", 15000)
+    assert len(body) > SPOOL_THRESHOLD_BYTES
+
+    response = admin_client.post(
+        "/admin/import",
+        data={"kind": "time_records", "csv_file": (io.BytesIO(body), "shifts.csv")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert TimeRecord.query.count() == 15000
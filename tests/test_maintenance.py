@@ -0,0 +1,89 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from extensions import db
+from journal import latest_seq
+from maintenance import AUTO_VACUUM_INCREMENTAL, run_task
+from models import ChangeJournal
+
+
+@pytest.fixture
+def legacy_app(app):
+    """The app on a database created before incremental auto-vacuum."""
+    with app.app_context():
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("PRAGMA auto_vacuum = NONE")
+            connection.exec_driver_sql("VACUUM")
+    return app
+
+
+def _auto_vacuum(app):
+    with app.app_context(), db.engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+
+
+def test_nightly_vacuum_skips_a_database_that_needs_converting(legacy_app):
+    with legacy_app.app_context():
+        run = run_task("main", "incremental_vacuum")
+        assert (run.status, run.bytes_reclaimed) == ("skipped", 0)
+        assert "convert_auto_vacuum" in run.detail
+    assert _auto_vacuum(legacy_app) == 0
+
+
+def test_convert_auto_vacuum_switches_once(legacy_app):
+    with legacy_app.app_context():
+        converted = run_task("main", "convert_auto_vacuum")
+        again = run_task("main", "convert_auto_vacuum")
+        nightly = run_task("main", "incremental_vacuum")
+        assert converted.status == "ok"
+        assert (again.status, again.detail) == ("skipped", "already incremental")
+        assert nightly.status == "ok"
+    assert _auto_vacuum(legacy_app) == AUTO_VACUUM_INCREMENTAL
+
+
+def _journal(app, ages_in_days):
+    now = datetime.now()
+    with app.app_context():
+        db.session.execute(insert(ChangeJournal), [
+            {"entity": "time_record", "operation": "insert", "changed_at": now - timedelta(days=age)}
+            for age in ages_in_days
+        ])
+        db.session.commit()
+        return db.session.scalars(db.select(ChangeJournal.seq).order_by(ChangeJournal.seq)).all()
+
+
+def _cache_file(app, name):
+    cache_dir = app.config["EXPORT_CACHE_DIR"]
+    os.makedirs(cache_dir, exist_ok=True)
+    open(os.path.join(cache_dir, name), "w").close()
+
+
+def test_prune_change_journal_drops_old_rows_and_the_exports_that_need_them(app):
+    seqs = _journal(app, [90, 60, 45, 1, 0])
+    for name in (
+        f"main-20260105-20260118-csv-{seqs[1]}.csv",
+        f"main-20260105-20260118-csv-{seqs[3]}.csv",
+        f"east-20260105-20260118-csv-{seqs[1]}.csv",
+    ):
+        _cache_file(app, name)
+
+    with app.app_context():
+        run = run_task("main", "prune_change_journal")
+        assert run.status == "ok"
+        assert db.session.scalars(db.select(ChangeJournal.seq).order_by(ChangeJournal.seq)).all() == seqs[3:]
+
+    assert sorted(os.listdir(app.config["EXPORT_CACHE_DIR"])) == [
+        f"east-20260105-20260118-csv-{seqs[1]}.csv",
+        f"main-20260105-20260118-csv-{seqs[3]}.csv",
+    ]
+
+
+def test_prune_change_journal_keeps_the_newest_row(app):
+    seqs = _journal(app, [90, 60])
+
+    with app.app_context():
+        run_task("main", "prune_change_journal")
+        assert latest_seq() == seqs[-1]
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+
+from migrations import LATEST_VERSION, current_version, upgrade
+from pay_periods import get_pay_period_index
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'clock.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _columns(engine, table_name):
+    return {column["name"] for column in inspect(engine).get_columns(table_name)}
+
+
+def _indexes(engine, table_name):
+    return {index["name"] for index in inspect(engine).get_indexes(table_name)}
+
+
+def _insert_shifts(connection, clock_ins):
+    for record_id, clock_in in enumerate(clock_ins, start=1):
+        connection.execute(
+            text("INSERT INTO time_record (id, employee_id, clock_in) VALUES (:id, 1, :clock_in)"),
+            {"id": record_id, "clock_in": clock_in.isoformat(sep=" ")}
+        )
+
+
+def _stored_pay_periods(engine):
+    with engine.connect() as connection:
+        return dict(connection.execute(text("SELECT id, pay_period_index FROM time_record")).all())
+
+
+def test_fresh_database_is_created_current_with_incremental_auto_vacuum(engine):
+    assert upgrade(engine) == LATEST_VERSION
+
+    assert current_version(engine) == LATEST_VERSION
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL
+    assert {"employee", "time_record", "outbox_message", "change_journal", "maintenance_run"} <= set(
+        inspect(engine).get_table_names()
+    )
+    assert "pay_period_index" in _columns(engine, "time_record")
+
+
+def test_unversioned_legacy_database_runs_every_migration(engine):
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE employee (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, "
+            "employee_code VARCHAR(4) NOT NULL UNIQUE)"
+        ))
+        connection.execute(text(
+            "CREATE TABLE time_record (id INTEGER PRIMARY KEY, "
+            "employee_id INTEGER NOT NULL REFERENCES employee (id), clock_in DATETIME, clock_out DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO employee (id, name, employee_code) VALUES (1, 'Ada Lovelace', '1815')"))
+        _insert_shifts(connection, [datetime(2026, 1, 5, 9, 0)])
+
+    assert upgrade(engine) == LATEST_VERSION
+
+    assert current_version(engine) == LATEST_VERSION
+    tables = set(inspect(engine).get_table_names())
+    assert {
+        "employee_bonus", "employee_hours_adjustment", "cache_version",
+        "outbox_message", "change_journal", "maintenance_run",
+    } <= tables
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT is_manager FROM employee WHERE id = 1")).scalar() == 0
+        # auto_vacuum can't be switched once tables exist; maintenance.convert_auto_vacuum does the VACUUM.
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 0
+    assert {
+        "ix_time_record_employee_clock_in", "ix_time_record_clock_in",
+        "ix_time_record_open", "ix_time_record_pay_period",
+    } <= _indexes(engine, "time_record")
+    assert _stored_pay_periods(engine) == {1: 1}
+
+
+def test_current_database_only_reads_schema_version(engine):
+    upgrade(engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert upgrade(engine) == LATEST_VERSION
+
+    assert statements == ["SELECT version FROM schema_version"]
+
+
+def test_version_7_database_gets_pay_period_index_backfilled(engine):
+    upgrade(engine)
+    clock_ins = [
+        datetime(2025, 12, 21, 23, 59),  # the day before the anchor period
+        datetime(2025, 12, 22, 0, 0),    # first day of the anchor period
+        datetime(2026, 1, 4, 23, 59),    # last minute of the anchor period
+        datetime(2026, 1, 5, 0, 0),
+        datetime(2026, 10, 19, 13, 30),
+        datetime(2024, 2, 29, 8, 0),
+    ]
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_time_record_pay_period"))
+        connection.execute(text("ALTER TABLE time_record DROP COLUMN pay_period_index"))
+        connection.execute(text("UPDATE schema_version SET version = 7"))
+        connection.execute(text(
+            "INSERT INTO employee (id, name, employee_code, is_manager) VALUES (1, 'Ada Lovelace', '1815', 0)"
+        ))
+        _insert_shifts(connection, clock_ins)
+
+    assert upgrade(engine) == 8
+
+    assert "ix_time_record_pay_period" in _indexes(engine, "time_record")
+    assert _stored_pay_periods(engine) == {
+        record_id: get_pay_period_index(clock_in.date())
+        for record_id, clock_in in enumerate(clock_ins, start=1)
+    }
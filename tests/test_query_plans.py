@@ -0,0 +1,174 @@
+"""Fail when a hot query's plan falls back to a full table scan.
+
+Each hot path runs through the same helpers routes.py uses against a seeded
+database. The SQL it sends is captured and checked with EXPLAIN QUERY PLAN,
+both before and after ANALYZE, since nightly maintenance refreshes planner
+statistics. A scan of a partial index, which only holds matching rows, is
+allowed.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert, text
+
+import routes
+from extensions import db
+from models import Employee, EmployeeBonus, EmployeeHoursAdjustment, TimeRecord
+from pay_periods import get_pay_period_bounds
+
+EMPLOYEES = 200
+SHIFTS_PER_EMPLOYEE = 60
+EMPLOYEE_ID = 7
+TREND_PERIODS = 6
+
+CHECKED_TABLES = ("time_record", "employee", "employee_bonus", "employee_hours_adjustment")
+SCAN_PATTERN = re.compile(
+    r"^SCAN (?P<table>\w+?)(?:_\d+)?(?: USING (?:COVERING )?INDEX (?P<index>\w+))?\b"
+)
+
+Period = namedtuple("Period", "start end range_start range_end")
+
+HOT_PATHS = {
+    "employee_code login": lambda period: db.session.scalars(routes._employee_by_code_statement("0007")).first(),
+    "active shift": lambda period: routes._get_active_record(EMPLOYEE_ID),
+    "open shifts (live board)": lambda period: routes._open_shift_events(),
+    "period records": lambda period: db.session.scalars(
+        routes._period_records_statement(EMPLOYEE_ID, period.range_start, period.range_end)
+    ).all(),
+    "closed hours": lambda period: routes._closed_hours_between(EMPLOYEE_ID, period.range_start, period.range_end),
+    "range records": lambda period: db.session.scalars(
+        routes._range_records_statement(period.range_start, period.range_end)
+    ).all(),
+    "range totals": lambda period: db.session.execute(
+        routes._range_totals_statement(period.range_start, period.range_end)
+    ).all(),
+    "admin report (one employee)": lambda period: db.session.scalars(
+        routes._admin_report_statement(period.range_start, period.range_end, db.session.get(Employee, EMPLOYEE_ID))
+    ).unique().all(),
+    "admin report (all employees)": lambda period: db.session.scalars(
+        routes._admin_report_statement(period.range_start, period.range_end, None)
+    ).unique().all(),
+    "bonus for period": lambda period: routes._get_bonus_for_period(EMPLOYEE_ID, period.start, period.end),
+    "adjustment for period": lambda period: routes._get_hours_adjustment_for_period(
+        EMPLOYEE_ID, period.start, period.end
+    ),
+    "period bonuses": lambda period: db.session.scalars(
+        routes._period_bonuses_statement(period.start, period.end)
+    ).all(),
+    "period adjustments": lambda period: db.session.scalars(
+        routes._period_adjustments_statement(period.start, period.end)
+    ).all(),
+    "employee search (name)": lambda period: routes._search_employees("employee1", 25),
+    "employee search (code)": lambda period: routes._search_employees("00", 25, 25),
+    "pay period trend": lambda period: routes._build_pay_period_trend(TREND_PERIODS, period.end),
+}
+
+# The trend has a row for every employee, so reading the whole roster is the
+# point; its shifts still have to come from an index.
+ROSTER_PATHS = {"pay period trend"}
+
+
+def _seed(period_start):
+    db.session.execute(insert(Employee), [
+        {"name": f"Employee{index} Lastname{index}", "employee_code": f"{index:04d}", "is_manager": False}
+        for index in range(1, EMPLOYEES + 1)
+    ])
+    records = []
+    for employee_id in range(1, EMPLOYEES + 1):
+        for shift in range(SHIFTS_PER_EMPLOYEE):
+            # Shifts run back a year from the current period, so most history is
+            # old and one period is a small slice of the table.
+            clock_in = datetime.combine(period_start, datetime.min.time()) - timedelta(
+                days=shift * 6, hours=-8, minutes=employee_id % 45
+            )
+            records.append({
+                "employee_id": employee_id,
+                "clock_in": clock_in,
+                "clock_out": clock_in + timedelta(hours=8) if shift or employee_id % 5 else None,
+            })
+    db.session.execute(insert(TimeRecord), records)
+    periods = [period_start - timedelta(days=14 * back) for back in range(26)]
+    for model, column, value in ((EmployeeBonus, "amount", 50), (EmployeeHoursAdjustment, "adjusted_hours", 80)):
+        db.session.execute(insert(model), [
+            {
+                "employee_id": employee_id,
+                "period_start": start,
+                "period_end": start + timedelta(days=13),
+                column: value,
+            }
+            for start in periods
+            for employee_id in range(1, EMPLOYEES + 1, 3)
+        ])
+    db.session.commit()
+
+
+@pytest.fixture(scope="module")
+def period(module_app):
+    start, end = get_pay_period_bounds(datetime.now().date())
+    with module_app.app_context():
+        _seed(start)
+    return Period(
+        start,
+        end,
+        datetime.combine(start, datetime.min.time()),
+        datetime.combine(end + timedelta(days=1), datetime.min.time()),
+    )
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["without-statistics", "after-analyze"])
+def analyzed(request, module_app, period):
+    # Module scoped, so pytest runs every path without statistics before ANALYZE.
+    if request.param:
+        with module_app.app_context():
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+    return request.param
+
+
+def _capture(engine, run):
+    """Run run() and return the (statement, parameters) pairs it sent to the database."""
+    captured = []
+
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def _partial_indexes():
+    return {
+        index.name
+        for table in db.metadata.tables.values()
+        for index in table.indexes
+        if index.dialect_options["sqlite"]["where"] is not None
+    }
+
+
+@pytest.mark.parametrize("name", list(HOT_PATHS))
+def test_hot_path_uses_an_index(module_app, period, analyzed, name):
+    checked_tables = set(CHECKED_TABLES) - ({"employee"} if name in ROSTER_PATHS else set())
+    with module_app.app_context():
+        engine = db.engine
+        partial_indexes = _partial_indexes()
+        statements = _capture(engine, lambda: HOT_PATHS[name](period))
+        db.session.rollback()
+        assert statements
+
+        scans = []
+        with engine.connect() as connection:
+            cursor = connection.connection.driver_connection.cursor()
+            for statement, parameters in statements:
+                plan = [row[3] for row in cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+                for detail in plan:
+                    match = SCAN_PATTERN.match(detail)
+                    if match and match.group("table") in checked_tables and match.group("index") not in partial_indexes:
+                        scans.append(f"{' '.join(statement.split())}\n    {detail}")
+
+    assert not scans, "full table scan:\n" + "\n".join(scans)
@@ -0,0 +1,87 @@
+"""Production WSGI entry point.
+
+    pip install -r requirements-prod.txt
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Importing this module builds the app and brings every site's schema up to
+date. With gunicorn's preload_app that happens once, in the master, before
+workers are forked. Building the app starts no threads, so the master forks
+from a single-threaded process; each worker starts its own outbox and
+maintenance threads in after_fork(). Each worker then runs after_fork() and warm_up() (hooked
+up in gunicorn.conf.py) before it accepts a request, so the first request
+after a deploy doesn't pay for opening connections, compiling statements and
+templates, or reading the current pay period from disk.
+"""
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+import maintenance
+import outbox
+from app import create_app
+from extensions import db
+from live import hub
+from migrations import upgrade_all
+from models import Employee
+from sites import ADMIN_SITE_SESSION_KEY, site_engines
+
+application = create_app()
+with application.app_context():
+    upgrade_all()
+
+
+def after_fork(app):
+    """Forget database connections inherited from the master and start background threads."""
+    with app.app_context():
+        for engine in site_engines().values():
+            # close=False leaves the master's connections open for it; the
+            # worker just drops its copies and opens its own.
+            engine.dispose(close=False)
+    outbox.restart_after_fork(app)
+    maintenance.restart_after_fork(app)
+
+
+def _warm_up_requests():
+    today = datetime.now().date().isoformat()
+    return [
+        ("GET", "/clock/login", None),
+        ("GET", "/admin", None),
+        ("POST", "/admin/report", {"view_mode": "pay_period", "pay_period_date": today, "employee_id": "all"}),
+        ("GET", "/admin/hours-bonuses", None),
+        ("GET", "/admin/export-hours", None),
+    ]
+
+
+def warm_up(app):
+    """Fill this worker's connection pools, statement and template caches; return the milliseconds taken."""
+    started = time.perf_counter()
+    with app.app_context():
+        for engine in site_engines().values():
+            size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+            connections = [engine.connect() for _ in range(size)]
+            for connection in connections:
+                # Reads the employee_code index, which every kiosk login searches.
+                connection.execute(select(Employee.employee_code)).all()
+                connection.close()
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        db.session.remove()
+
+    # Real requests through the app compile the ORM statements and render the
+    # cached fragments of the busiest pages for the current pay period.
+    client = app.test_client()
+    for site in app.config["SITES"]:
+        with client.session_transaction() as session:
+            session["admin_authenticated"] = True
+            session[ADMIN_SITE_SESSION_KEY] = site
+        for method, path, data in _warm_up_requests():
+            response = client.open(path, method=method, data=data)
+            if response.status_code >= 500:
+                app.logger.warning("Warm-up %s %s for site %s returned %s", method, path, site, response.status_code)
+    return (time.perf_counter() - started) * 1000
+
+
+def close_streams():
+    """End open live board streams so a graceful stop isn't held up by them."""
+    hub.close()